@@ -1,17 +1,46 @@
 import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, simpledialog
+from tkinter import ttk, messagebox, filedialog, simpledialog, font as tkfont
 import csv
 import webbrowser
 import urllib.parse
+import urllib.request
+import http.client
 from collections import Counter
+import heapq
+import math
 import json
+import pickle
 from PIL import Image, ImageTk  # Added for logo display
 import sys
 import os
 import threading
+import multiprocessing
+import time
+import re
+import shutil
+import subprocess
+import tempfile
+import unicodedata
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import defaultdict, deque
+from array import array
+from itertools import chain, compress, islice
+from difflib import SequenceMatcher
+from abc import ABC, abstractmethod
 import yt_dlp
 
+try:
+    import numpy as np  # Optional: vectorised filtering for the in-memory snapshot
+except ImportError:
+    np = None
+
+try:
+    import mutagen  # Optional: read embedded tags when scanning the local music library
+except ImportError:
+    mutagen = None
+
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
     try:
@@ -21,10 +50,611 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     
     return os.path.join(base_path, relative_path)
+
+def master_fingerprint(path):
+    """Size, mtime and SQLite file change counter of a database file, or None if it can't be read."""
+    try:
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            header = f.read(100)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, header[24:28])
+
+def normalize_track(artist, title):
+    """Match key for a track: accents, case, punctuation and a leading 'The' are ignored."""
+    def norm(text):
+        text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode().lower()
+        text = re.sub(r'[^a-z0-9]+', ' ', text.replace('&', ' and ')).strip()
+        return text[4:] if text.startswith('the ') else text
+    return f"{norm(artist)}|{norm(title)}"
+
+def read_audio_tags(path):
+    """Artist and title of an audio file from its tags, falling back to an 'Artist - Title' file name.
+
+    Runs in a worker process during library scans, so it must stay a plain module-level function.
+    """
+    try:
+        if mutagen is not None:
+            audio = mutagen.File(path, easy=True)
+            if audio is not None and audio.tags:
+                artist, title = (audio.tags.get('artist') or [''])[0], (audio.tags.get('title') or [''])[0]
+                if artist and title: return artist, title
+        elif path.lower().endswith('.mp3'):
+            with open(path, 'rb') as f:
+                f.seek(-128, os.SEEK_END)
+                tag = f.read(128)
+            if tag[:3] == b'TAG':
+                title, artist = tag[3:33].decode('latin-1').strip('\x00 '), tag[33:63].decode('latin-1').strip('\x00 ')
+                if artist and title: return artist, title
+    except Exception:
+        pass
+    name = os.path.splitext(os.path.basename(path))[0]
+    if ' - ' in name:
+        artist, title = name.split(' - ', 1)
+        return artist.strip(), title.strip()
+    return '', name.strip()
 	
 # --- Define two separate database files ---
 MASTER_DB_FILE = "staffordsongs.db"  # Your main database with music records
 USER_PLAYLIST_DB_FILE = "user_playlists.db" # New database for user-created playlists
+STARTUP_SNAPSHOT_FILE = "startup_snapshot.pkl" # Cached dropdowns, statistics and first page for fast launches
+STARTUP_SNAPSHOT_VERSION = 3
+
+# --- Local music library ---
+LIBRARY_EXTENSIONS = ('.mp3', '.m4a', '.flac', '.ogg', '.wav', '.aac', '.wma')
+LIBRARY_POOL_MIN_FILES = 32  # Below this many changed files, tags are read in-process
+
+# --- Download pipeline ---
+DOWNLOAD_BITRATE_KBPS = 192  # MP3 bitrate for transcoded downloads
+DOWNLOAD_FETCH_WORKERS = 3   # Concurrent network fetches; transcodes get one process per CPU
+
+# --- Release metadata enrichment ---
+METADATA_PROVIDER = 'discogs'    # 'discogs' (needs a DISCOGS_TOKEN environment variable) or 'stub' (offline, for testing)
+METADATA_CACHE_TTL_DAYS = 30     # Cached lookups (including "not found") older than this are fetched again
+METADATA_FETCH_WORKERS = 4       # Concurrent lookups; the provider's rate limit still applies across all of them
+METADATA_FLUSH_EVERY = 50        # Lookups written to the cache per transaction
+
+# --- Playlist generator tuning ---
+GENERATOR_POOL_SIZE = 1500   # Most-played candidate tracks considered for a generated set
+GENERATOR_LABEL_GAP = 3      # Same label may not reappear within this many tracks
+
+# --- Playlist version history ---
+PLAYLIST_CHECKPOINT_MIN_OPS = 50  # Checkpoint after this many edits, or one per track for longer playlists
+PLAYLIST_HISTORY_KEEP = 500       # Compaction keeps at least this many recent versions of each playlist
+
+# --- Change tracking for the master database ---
+CHANGE_POLL_MS = 2000        # How often to check whether the master database file changed
+STAT_FIELDS = ['Artist', 'Title', 'Label', 'DJ', 'Club', 'Venue', 'Town', 'Country', 'Date']  # Column order used for deltas
+
+# --- Instrumentation ---
+SLOW_QUERY_MS = 100          # Queries slower than this are logged with their parameters and query plan
+STALL_TICK_MS = 100          # Event-loop heartbeat interval
+STALL_THRESHOLD_MS = 250     # Heartbeat lateness reported as a UI stall
+PROFILE_MAX_EVENTS = 5000    # Most recent events kept for the developer panel
+
+def date_sort_key(row):
+    """SQLite's ORDER BY Date ordering (NULL, then numbers, then text) for merging per-archive results."""
+    value = row[8]
+    if value is None: return (0, 0)
+    if isinstance(value, (int, float)): return (1, value)
+    return (2, str(value))
+
+def count_archive(conn):
+    """Total rows and per-field value counts for one archive connection."""
+    total = conn.execute("SELECT COUNT(*) FROM Playlists").fetchone()[0]
+    counts = {}
+    for field in STAT_FIELDS:
+        rows = conn.execute(f"SELECT {field}, COUNT(*) FROM Playlists WHERE {field} IS NOT NULL AND {field} != '' GROUP BY {field}").fetchall()
+        counts[field] = Counter(dict(rows))
+    return total, counts
+
+def track_key_rows(conn):
+    """(match_key, artist, title, label, dj, club, town, country, date) per artist/title, most-played spelling first."""
+    # Bare columns next to MAX(Date) come from the most recent play of each track
+    rows = conn.execute("""SELECT Artist, Title, Label, DJ, Club, Town, Country, MAX(Date), COUNT(*) AS plays
+                           FROM Playlists WHERE Artist IS NOT NULL AND Title IS NOT NULL
+                           GROUP BY Artist, Title ORDER BY plays DESC""").fetchall()
+    return [(normalize_track(row[0], row[1]),) + tuple(row[:8]) for row in rows]
+
+def open_archive_reader(path):
+    """Read-only connection that may be handed to a pool thread (one task per archive at a time)."""
+    uri = f"file:{urllib.request.pathname2url(os.path.abspath(path))}?mode=ro"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False, factory=ProfiledConnection)
+
+def archive_problem(path):
+    """Why `path` can't be searched alongside the master (not a database, no Playlists table, missing columns), or None."""
+    try:
+        conn = open_archive_reader(path)
+        try:
+            columns = {row[1].lower() for row in conn.execute("PRAGMA table_info(Playlists)")}
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return str(e)
+    if not columns:
+        return "it has no Playlists table"
+    missing = [field for field in STAT_FIELDS if field.lower() not in columns]
+    if missing:
+        return f"its Playlists table has no {', '.join(missing)} column" + ("s" if len(missing) > 1 else "")
+    return None
+
+def read_playlist_file(path):
+    """(artist, title) pairs from a CSV (as written by export_playlist) or an M3U playlist."""
+    def split_name(text):
+        artist, _, title = text.partition(' - ')
+        return (artist.strip(), title.strip()) if title else ('', artist.strip())
+
+    tracks = []
+    if path.lower().endswith(('.m3u', '.m3u8')):
+        extinf = None
+        with open(path, encoding='utf-8-sig', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('#EXTINF:'):
+                    extinf = line.split(',', 1)[1] if ',' in line else None
+                elif line.startswith('# Not in library: '):
+                    tracks.append(split_name(line[len('# Not in library: '):]))
+                elif line and not line.startswith('#'):
+                    if extinf: tracks.append(split_name(extinf))
+                    else: tracks.append(read_audio_tags(os.path.join(os.path.dirname(path), line)))
+                    extinf = None
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                row = {(k or '').strip().lower(): (v or '').strip() for k, v in row.items()}
+                tracks.append((row.get('artist', ''), row.get('title', '')))
+    return tracks
+
+def empty_playlist_state():
+    return {'name': None, 'created': None, 'items': [], 'deleted': True}
+
+def apply_playlist_op(state, op, data):
+    """Replay one logged edit onto a playlist state ({'name', 'created', 'items', 'deleted'}) in place."""
+    items = state['items']
+    if op == 'create':
+        state.update(name=data['name'], created=data.get('created'), deleted=False); items.clear()
+    elif op == 'rename': state['name'] = data['new']
+    elif op == 'delete': state['deleted'] = True; items.clear()
+    elif op == 'insert': items.insert(data['pos'], data['item'])
+    elif op == 'insert_many': items[data['pos']:data['pos']] = data['items']
+    elif op == 'remove': del items[data['pos']]
+    elif op == 'remove_many': del items[data['pos']:data['pos'] + data['count']]
+    elif op == 'move': items.insert(data['to'], items.pop(data['from']))
+    elif op == 'restore':
+        for sub_op, sub_data in data['ops']: apply_playlist_op(state, sub_op, sub_data)
+    else: raise ValueError(f"Unknown playlist op {op!r}")
+    return state
+
+def diff_playlist_states(current, target):
+    """The ops that turn playlist state `current` into `target`, sized by what differs rather than by the playlist."""
+    if target['deleted']:
+        return [] if current['deleted'] else [['delete', {'name': current['name']}]]
+    if current['deleted']:
+        ops = [['create', {'name': target['name'], 'created': target['created']}]]
+        if target['items']: ops.append(['insert_many', {'pos': 0, 'items': target['items']}])
+        return ops
+    ops = []
+    if current['name'] != target['name']: ops.append(['rename', {'old': current['name'], 'new': target['name']}])
+    matcher = SequenceMatcher(None, [tuple(i) for i in current['items']], [tuple(i) for i in target['items']], autojunk=False)
+    # Work from the end so earlier positions stay valid while replaying
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag in ('delete', 'replace'): ops.append(['remove_many', {'pos': i1, 'count': i2 - i1}])
+        if tag in ('insert', 'replace'): ops.append(['insert_many', {'pos': i1, 'items': target['items'][j1:j2]}])
+    return ops
+
+def describe_playlist_op(op, data):
+    if op == 'create': return f"Created '{data['name']}'"
+    if op == 'rename': return f"Renamed '{data['old']}' to '{data['new']}'"
+    if op == 'delete': return f"Deleted '{data['name']}'"
+    if op == 'insert': return f"Added {data['item'][0]} - {data['item'][1]}"
+    if op == 'insert_many': return f"Added {len(data['items'])} tracks"
+    if op == 'remove': return f"Removed {data['item'][0]} - {data['item'][1]}"
+    if op == 'move': return f"Moved track {data['from'] + 1} to position {data['to'] + 1}"
+    if op == 'restore': return f"Restored version {data['to']}"
+    return op
+
+def safe_filename(text):
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]+', '', str(text)).strip(' .') or 'Unknown'
+
+def find_ffmpeg():
+    """ffmpeg next to the application (as shipped on Windows/Mac), else on PATH."""
+    for folder in (os.path.dirname(os.path.abspath(sys.argv[0])), os.getcwd()):
+        found = shutil.which('ffmpeg', path=folder)
+        if found: return found
+    return shutil.which('ffmpeg')
+
+def archive_tags(track):
+    """ID3 tags for a Playlists row given as a dict with artist/title/label/dj/club/town/country/date keys."""
+    year = re.search(r'\b(19|20)\d{2}\b', track.get('date') or '')
+    venue = ", ".join(v for v in (track.get('club'), track.get('town'), track.get('country')) if v)
+    played = " ".join(p for p in (f"by {track['dj']}" if track.get('dj') else '', f"at {venue}" if venue else '', f"on {track['date']}" if track.get('date') else '') if p)
+    return {
+        'artist': track.get('artist'),
+        'title': track.get('title'),
+        'publisher': track.get('label'),  # TPUB
+        'date': year.group() if year else None,  # TDRC
+        'DJ': track.get('dj'),  # TXXX:DJ
+        'comment': f"Played {played}" if played else None,
+    }
+
+def fetch_youtube_audio(track, staging_dir):
+    """Download the best audio stream for a track without post-processing; returns the file path."""
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'outtmpl': os.path.join(staging_dir, 'source.%(ext)s'),
+        'noplaylist': True,
+        'quiet': True,
+        'no_warnings': True
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(f"ytsearch1:{track['artist']} {track['title']}", download=True)
+        entries = info.get('entries') if 'entries' in info else [info]
+        if not entries:
+            raise RuntimeError("No YouTube results")
+        downloads = entries[0].get('requested_downloads')
+        return downloads[0]['filepath'] if downloads else ydl.prepare_filename(entries[0])
+
+def transcode_and_tag(ffmpeg, source, dest, bitrate_kbps, tags):
+    """Transcode `source` to an MP3 at `dest` with ID3 tags, then delete `source`. Runs in a worker process."""
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-i', source, '-vn', '-map_metadata', '-1',
+           '-codec:a', 'libmp3lame', '-b:a', f"{bitrate_kbps}k", '-id3v2_version', '3']
+    for key, value in tags.items():
+        if value: cmd += ['-metadata', f"{key}={value}"]
+    cmd.append(dest)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with code {result.returncode}")
+    os.remove(source)
+    return dest
+
+class DownloadPipeline:
+    """Fetches audio on a few threads and hands each file to a process pool for transcoding and tagging,
+    so network transfers and ffmpeg work overlap."""
+    def __init__(self, ffmpeg, fetch=fetch_youtube_audio, bitrate_kbps=DOWNLOAD_BITRATE_KBPS,
+                 fetch_workers=DOWNLOAD_FETCH_WORKERS, transcode_workers=None):
+        self.ffmpeg = ffmpeg
+        self.fetch = fetch
+        self.bitrate_kbps = bitrate_kbps
+        self.fetchers = ThreadPoolExecutor(max_workers=fetch_workers)
+        self.transcoders = ProcessPoolExecutor(max_workers=transcode_workers or os.cpu_count() or 1)
+
+    def submit(self, track, folder):
+        """Queue one track (dict as for archive_tags); the returned Future resolves to the final MP3 path."""
+        result = Future()
+        dest = os.path.join(folder, f"{safe_filename(track['artist'])} - {safe_filename(track['title'])}.mp3")
+        staging_dir = tempfile.mkdtemp(prefix='.download-', dir=folder)
+
+        def finished(transcode):
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            try:
+                result.set_result(transcode.result())
+            except Exception as e:
+                result.set_exception(e)
+
+        def fetched(fetch):
+            try:
+                source = fetch.result()
+                self.transcoders.submit(transcode_and_tag, self.ffmpeg, source, dest, self.bitrate_kbps,
+                                        archive_tags(track)).add_done_callback(finished)
+            except Exception as e:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                result.set_exception(e)
+
+        self.fetchers.submit(self.fetch, track, staging_dir).add_done_callback(fetched)
+        return result
+
+    def copy(self, source, folder):
+        """Copy a file already on disk (a library match) into `folder` on a fetch thread; the Future resolves to the copy's path."""
+        return self.fetchers.submit(shutil.copy2, source, folder)
+
+    def shutdown(self):
+        self.fetchers.shutdown(wait=False, cancel_futures=True)
+        self.transcoders.shutdown(wait=False, cancel_futures=True)
+
+class MetadataProvider(ABC):
+    """Release metadata source. Subclasses set `name` (the cache key) and `rate_per_sec` (0 = unlimited).
+
+    lookup() returns {'label', 'catno', 'year', 'artwork'} (values may be None) or None when the track
+    isn't found, and raises OSError for failures worth retrying later. It is called from worker threads.
+    """
+    name = None
+    rate_per_sec = 0
+
+    @abstractmethod
+    def lookup(self, artist, title):
+        pass
+
+class DiscogsProvider(MetadataProvider):
+    """Discogs database search; each worker thread keeps one HTTPS connection open between requests."""
+    name = 'discogs'
+    rate_per_sec = 1.0  # Discogs allows 60 authenticated requests a minute
+    HOST = 'api.discogs.com'
+
+    def __init__(self, token=None):
+        self.token = token or os.environ.get('DISCOGS_TOKEN')
+        if not self.token:
+            raise ValueError("Set the DISCOGS_TOKEN environment variable to a Discogs personal access token.")
+        self._local = threading.local()
+
+    def _get(self, path):
+        headers = {'User-Agent': 'PlaylistArchiveProject/1.0', 'Accept': 'application/json', 'Authorization': f"Discogs token={self.token}"}
+        conn = getattr(self._local, 'conn', None)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPSConnection(self.HOST, timeout=15)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                conn.close(); conn = self._local.conn = None
+                # The server drops idle keep-alive connections; a reused one gets one retry on a fresh connection
+                if not reused:
+                    raise OSError(f"Discogs request failed: {e}") from e
+                reused = False
+        # 404 means "not found"; anything else that isn't 200 (bad token, throttling, outages) is a failure
+        if response.status == 404: return None
+        if response.status != 200:
+            raise OSError(f"Discogs returned HTTP {response.status}")
+        return json.loads(body)
+
+    def lookup(self, artist, title):
+        query = urllib.parse.urlencode({'artist': artist, 'track': title, 'type': 'release', 'per_page': 1})
+        results = (self._get(f"/database/search?{query}") or {}).get('results')
+        if not results: return None
+        release = results[0]
+        return {'label': (release.get('label') or [None])[0], 'catno': release.get('catno'),
+                'year': release.get('year'), 'artwork': release.get('cover_image') or release.get('thumb')}
+
+class StubMetadataProvider(MetadataProvider):
+    """Offline provider with made-up but stable answers (about one track in five is "not found")."""
+    name = 'stub'
+
+    def __init__(self, delay=0.0, rate_per_sec=0):
+        self.delay = delay  # Simulated network latency per lookup
+        self.rate_per_sec = rate_per_sec
+
+    def lookup(self, artist, title):
+        if self.delay: time.sleep(self.delay)
+        digest = zlib.crc32(normalize_track(artist, title).encode('utf-8'))
+        if digest % 5 == 0: return None
+        return {'label': f"Stub Records {digest % 7}", 'catno': f"STB-{digest % 10000:04d}",
+                'year': str(1960 + digest % 20), 'artwork': f"https://example.invalid/artwork/{digest:08x}.jpg"}
+
+METADATA_PROVIDERS = {'discogs': DiscogsProvider, 'stub': StubMetadataProvider}
+
+class RateLimiter:
+    """Spaces calls at least 1/rate_per_sec seconds apart across all threads (0 = unlimited)."""
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        if not self.interval: return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now: time.sleep(slot - now)
+
+class MetadataFetcher:
+    """Looks tracks up through one provider on a small thread pool, within the provider's rate limit."""
+    def __init__(self, provider, workers=METADATA_FETCH_WORKERS):
+        self.provider = provider
+        self.limiter = RateLimiter(provider.rate_per_sec)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _lookup(self, artist, title):
+        self.limiter.wait()
+        return self.provider.lookup(artist, title)
+
+    def submit(self, tracks):
+        """One Future per (artist, title), resolving to the provider's answer."""
+        return [self.executor.submit(self._lookup, artist, title) for artist, title in tracks]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class Profiler:
+    """Collects timing events for SQL statements, Treeview refreshes and event-loop stalls."""
+    def __init__(self):
+        self.events = deque(maxlen=PROFILE_MAX_EVENTS)
+        self.slow_query_ms = SLOW_QUERY_MS
+        self.origin = time.perf_counter()
+
+    def record(self, cat, name, start, **args):
+        event = {'cat': cat, 'name': name, 'ts': start - self.origin, 'dur': time.perf_counter() - start,
+                 'tid': threading.get_ident(), 'args': args}
+        self.events.append(event)
+        return event
+
+    def add_fetch_time(self, event, conn, start):
+        """Fetching is part of a query's cost; check the slow threshold once the rows are in."""
+        event['dur'] += time.perf_counter() - start
+        if event['dur'] * 1000 >= self.slow_query_ms and not event['args'].get('slow'):
+            event['args']['slow'] = True
+            sql, params = event['args']['sql'], event['args'].get('params')
+            event['args']['plan'] = []
+            if params is not None:
+                try:
+                    # Call the base class so the plan lookup is not itself profiled
+                    plan = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                    event['args']['plan'] = [row[-1] for row in plan]
+                except sqlite3.Error:
+                    pass
+            print(f"Slow query ({event['dur'] * 1000:.1f} ms): {' '.join(sql.split())} params={params!r}")
+            for line in event['args']['plan']:
+                print(f"    {line}")
+
+    def clear(self):
+        self.events.clear()
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.events), f, indent=2, default=str)
+
+    def export_chrome_trace(self, path):
+        """Write events in the Chrome trace format (load in chrome://tracing or Perfetto)."""
+        trace = [{'name': e['name'], 'cat': e['cat'], 'ph': 'X', 'pid': os.getpid(), 'tid': e['tid'],
+                  'ts': round(e['ts'] * 1e6), 'dur': round(e['dur'] * 1e6), 'args': e['args']} for e in list(self.events)]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace}, f, default=str)
+
+PROFILER = Profiler()
+
+class ProfiledCursor(sqlite3.Cursor):
+    _event = None
+
+    def execute(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            name = sql.split(None, 1)[0].upper() if sql.strip() else 'SQL'
+            self._event = PROFILER.record('sql', name, start, sql=sql, params=args[0] if args else ())
+            PROFILER.add_fetch_time(self._event, self.connection, time.perf_counter())
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            self._event = PROFILER.record('sql', 'EXECUTEMANY', start, sql=sql, rows=len(seq_of_params))
+            PROFILER.add_fetch_time(self._event, self.connection, time.perf_counter())
+
+    def _timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        if self._event is not None:
+            PROFILER.add_fetch_time(self._event, self.connection, start)
+        return result
+
+    def fetchone(self): return self._timed_fetch(super().fetchone)
+    def fetchmany(self, *args): return self._timed_fetch(super().fetchmany, *args)
+    def fetchall(self): return self._timed_fetch(super().fetchall)
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection whose statements are all timed by PROFILER."""
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+class ColumnarArchive:
+    """Dictionary-encoded, column-oriented copy of the Playlists table(s) for in-memory filtering.
+
+    Each column is an array of small integer codes into a list of distinct display strings.
+    Rows are kept in the same Date DESC order that search() uses, so filter results need no sort.
+    """
+    FIELDS = STAT_FIELDS + ['Source']
+
+    def __init__(self, columns, dictionaries, row_count):
+        self.columns = columns            # field -> array of codes (NumPy array or stdlib array)
+        self.dictionaries = dictionaries  # field -> list of display values, indexed by code
+        self.row_count = row_count
+        self.lower_values = {field: [value.lower() for value in values] for field, values in dictionaries.items()}
+        if np is not None:
+            self.object_values = {field: np.array(values, dtype=object) for field, values in dictionaries.items()}
+
+    @classmethod
+    def load(cls, archives):
+        """Load [(source name, db path)], merging the archives' rows into one Date DESC sequence."""
+        conns = [sqlite3.connect(path, factory=ProfiledConnection) for _, path in archives]
+
+        def archive_rows(name, conn):
+            cursor = conn.execute(f"SELECT {', '.join(STAT_FIELDS)} FROM Playlists ORDER BY Date DESC")
+            while True:
+                batch = cursor.fetchmany(10000)
+                if not batch: return
+                yield from (row + (name,) for row in batch)
+
+        try:
+            streams = [archive_rows(name, conn) for (name, _), conn in zip(archives, conns)]
+            merged = streams[0] if len(streams) == 1 else heapq.merge(*streams, key=date_sort_key, reverse=True)
+            lookups = [{} for _ in cls.FIELDS]
+            codes = [array('I') for _ in cls.FIELDS]
+            row_count = 0
+            while True:
+                batch = list(islice(merged, 10000))
+                if not batch: break
+                row_count += len(batch)
+                for lookup, column, values in zip(lookups, codes, zip(*batch)):
+                    # Only values new to this column need a Python-level step; encoding the batch is a C-level map
+                    for value in set(values).difference(lookup):
+                        lookup[value] = len(lookup)
+                    column.extend(map(lookup.__getitem__, values))
+        finally:
+            for conn in conns: conn.close()
+
+        columns, dictionaries = {}, {}
+        for field, lookup, column in zip(cls.FIELDS, lookups, codes):
+            dictionaries[field] = [str(value) if value is not None else '' for value in lookup]
+            # Narrow each column to the smallest code width its dictionary allows
+            typecode = 'B' if len(lookup) <= 1 << 8 else 'H' if len(lookup) <= 1 << 16 else 'I'
+            if np is not None:
+                columns[field] = np.frombuffer(column, dtype=np.uint32).astype({'B': np.uint8, 'H': np.uint16, 'I': np.uint32}[typecode])
+            else:
+                columns[field] = column if typecode == 'I' else array(typecode, column)
+        return cls(columns, dictionaries, row_count)
+
+    def nbytes(self):
+        return sum(col.nbytes if np is not None else col.itemsize * len(col) for col in self.columns.values())
+
+    def _matching_codes(self, field, equals=None, contains=None):
+        if equals is not None:
+            return [code for code, value in enumerate(self.dictionaries[field]) if value == equals]
+        needle = contains.lower()
+        return [code for code, value in enumerate(self.lower_values[field]) if needle in value]
+
+    def filter(self, equals=None, contains=None):
+        """Row indices (in Date DESC order) matching all equality and case-insensitive substring filters."""
+        criteria = [(f, self._matching_codes(f, equals=v)) for f, v in (equals or {}).items()]
+        criteria += [(f, self._matching_codes(f, contains=v)) for f, v in (contains or {}).items()]
+        if not criteria:
+            return range(self.row_count)
+        if any(not codes for _, codes in criteria):
+            return []
+
+        if np is not None:
+            mask = None
+            for field, codes in criteria:
+                if len(codes) == 1:
+                    hits = self.columns[field] == codes[0]
+                else:
+                    lut = np.zeros(len(self.dictionaries[field]), dtype=bool)
+                    lut[codes] = True
+                    hits = lut[self.columns[field]]
+                mask = hits if mask is None else mask & hits
+            return np.flatnonzero(mask)
+
+        # Stdlib: build a 0/1 byte per row, AND masks together as big integers, then compress
+        mask = None
+        for field, codes in criteria:
+            column = self.columns[field]
+            lut = bytearray(len(self.dictionaries[field]) if column.typecode != 'B' else 256)
+            for code in codes: lut[code] = 1
+            hits = column.tobytes().translate(lut) if column.typecode == 'B' else bytes(map(lut.__getitem__, column))
+            bits = int.from_bytes(hits, 'little')
+            mask = bits if mask is None else mask & bits
+        return list(compress(range(self.row_count), mask.to_bytes(self.row_count, 'little')))
+
+    def rows(self, indices):
+        """Decode row indices back into display tuples in FIELDS order."""
+        if np is not None:
+            indices = np.asarray(indices, dtype=np.intp)
+            decoded = [self.object_values[f][self.columns[f][indices]] for f in self.FIELDS]
+        else:
+            decoded = [[self.dictionaries[f][self.columns[f][i]] for i in indices] for f in self.FIELDS]
+        return list(zip(*decoded))
 
 class MinimalPlaylistApp:
     def __init__(self, root):
@@ -44,20 +674,59 @@ class MinimalPlaylistApp:
         self.top_djs_tree = None
         self.details_text = None
 
+        # Per-field value counts for the master database, patched incrementally on updates
+        self.field_counts = {field: Counter() for field in STAT_FIELDS}
+        self.total_records = 0
+        self.master_state = None
+        self.last_query = None
+        self.last_params = None
+        self.columnar = None  # In-memory ColumnarArchive, loaded on demand
+        self.first_page = None  # Rows of the default results page
+        self.library_index = {}  # normalize_track key -> local file path
+        self.download_pipeline = None  # Created on first download
+        self.metadata_cache = {}  # normalize_track key -> (label, catno, year, artwork, fetched_at) for METADATA_PROVIDER
+        self.metadata_fetcher = None  # Created on first lookup
+        self.result_keys = {}  # normalize_track key -> results tree rows showing that track
+        self.credit_dj_lines = None  # Formatted DJ lines for the credits roll, rebuilt when the DJ counts change
+        self.archives = []  # [(source name, db path)], master first
+        self.archive_readers = {}  # db path -> read-only connection, only when several archives are mounted
+        self.archive_pool = None
+        self.last_limit = None
+        self.last_source = None  # Archive name the current results are limited to, or None for all
+        self.aggregates_pending = False  # A background recount of the archives is running
+        self.playlist_redo = {}  # playlist id -> versions undone this session, most recent last
+
         self.connect_dbs()
         self.init_playlist_tables()
+        self.load_library_index()
+        self.load_metadata_cache()
+        self.install_change_tracking()
+        self.open_archives()
+        restored = self.restore_startup_snapshot()
+        if not restored:
+            self.load_aggregates()
+            self.trim_changelog()
+            self.master_state = self.read_master_state()
         self.create_widgets()
+        self.update_source_column()
         self.populate_dropdowns()
         self.load_data() # Loads from master_db initially
+        if not restored:
+            self.save_startup_snapshot()
+        self.root.after(CHANGE_POLL_MS, self.check_master_changes)
+        self.root.after(STALL_TICK_MS, self.check_event_loop, time.perf_counter())
+        self.prefetch_track_keys()
+        self.index_master_for_generator()
+        self.root.bind_all('<Control-Shift-D>', lambda e: self.show_developer_panel())
 
     def connect_dbs(self):
         try:
             # Connect to the master music database
-            self.conn_master = sqlite3.connect(MASTER_DB_FILE)
+            self.conn_master = sqlite3.connect(MASTER_DB_FILE, factory=ProfiledConnection)
             self.cursor_master = self.conn_master.cursor()
 
             # Connect to the user playlists database
-            self.conn_playlists = sqlite3.connect(USER_PLAYLIST_DB_FILE)
+            self.conn_playlists = sqlite3.connect(USER_PLAYLIST_DB_FILE, factory=ProfiledConnection)
             self.cursor_playlists = self.conn_playlists.cursor()
 
         except sqlite3.Error as e:
@@ -91,6 +760,62 @@ class MinimalPlaylistApp:
                     FOREIGN KEY (playlist_id) REFERENCES user_playlists(id) ON DELETE CASCADE
                 )
             ''')
+            self.cursor_playlists.execute('''
+                CREATE TABLE IF NOT EXISTS library_folders (
+                    path TEXT PRIMARY KEY
+                )
+            ''')
+            self.cursor_playlists.execute('''
+                CREATE TABLE IF NOT EXISTS library_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    artist TEXT,
+                    title TEXT,
+                    match_key TEXT
+                )
+            ''')
+            self.cursor_playlists.execute("CREATE INDEX IF NOT EXISTS idx_library_files_match_key ON library_files (match_key)")
+            # Append-only edit log; 'base' is the version each edit was made on top of, so undo can follow it back
+            self.cursor_playlists.execute('''
+                CREATE TABLE IF NOT EXISTS playlist_ops (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    playlist_id INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    base INTEGER,
+                    op TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (playlist_id, version)
+                )
+            ''')
+            self.cursor_playlists.execute('''
+                CREATE TABLE IF NOT EXISTS playlist_checkpoints (
+                    playlist_id INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (playlist_id, version)
+                )
+            ''')
+            # Release metadata per provider; a row of NULLs records "not found" so it isn't asked again until it expires
+            self.cursor_playlists.execute('''
+                CREATE TABLE IF NOT EXISTS metadata_cache (
+                    match_key TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    label TEXT,
+                    catno TEXT,
+                    year TEXT,
+                    artwork TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (match_key, provider)
+                )
+            ''')
+            self.cursor_playlists.execute('''
+                CREATE TABLE IF NOT EXISTS archive_sources (
+                    path TEXT PRIMARY KEY,
+                    name TEXT NOT NULL
+                )
+            ''')
             self.conn_playlists.commit()
         except sqlite3.Error as e:
             messagebox.showerror("Playlist Database Error", str(e))
@@ -154,7 +879,12 @@ class MinimalPlaylistApp:
 
         ttk.Button(btn_frame, text="New", command=self.create_playlist).pack(side='left', padx=(0,5))
         ttk.Button(btn_frame, text="Rename", command=self.rename_playlist).pack(side='left', padx=(0,5))
-        ttk.Button(btn_frame, text="Delete", command=self.delete_playlist).pack(side='left')
+        ttk.Button(btn_frame, text="Delete", command=self.delete_playlist).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Generate", command=self.show_generate_dialog).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Import", command=self.import_playlist).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Undo", command=self.undo_playlist).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Redo", command=self.redo_playlist).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="History", command=self.show_history_window).pack(side='left')
 
         self.playlist_tree = ttk.Treeview(parent, columns=('Count', 'Created'), show='tree headings', height=15)
         self.playlist_tree.heading('#0', text='Playlist Name')
@@ -171,6 +901,8 @@ class MinimalPlaylistApp:
         playlist_scroll.pack(side='right', fill='y')
 
         self.playlist_tree.bind('<<TreeviewSelect>>', self.on_playlist_select)
+        self.playlist_tree.bind('<Control-z>', lambda e: self.undo_playlist())
+        self.playlist_tree.bind('<Control-y>', lambda e: self.redo_playlist())
 
         self.load_playlists()
 
@@ -182,7 +914,7 @@ class MinimalPlaylistApp:
         ttk.Button(btn_frame, text="Download Selected", command=lambda: self.download_audio('playlist')).pack(side='left', padx=(0,5))
         ttk.Button(btn_frame, text="Move Up", command=lambda: self.move_track(-1)).pack(side='left', padx=(0,5))
         ttk.Button(btn_frame, text="Move Down", command=lambda: self.move_track(1)).pack(side='left', padx=(0,5))
-        ttk.Button(btn_frame, text="Export CSV", command=self.export_playlist).pack(side='left')
+        ttk.Button(btn_frame, text="Export", command=self.export_playlist).pack(side='left')
 
         self.playlist_label = ttk.Label(parent, text="Select a playlist")
         self.playlist_label.grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(0,5))
@@ -207,7 +939,10 @@ class MinimalPlaylistApp:
         parent.rowconfigure(2, weight=1)
 
         self.playlist_contents_tree.bind('<Button-3>', self.show_playlist_context_menu)
+        self.playlist_contents_tree.tag_configure('in_library', background='#e2f2e2')
         self.playlist_contents_tree.bind('<Double-1>', self.on_playlist_double_click)
+        self.playlist_contents_tree.bind('<Control-z>', lambda e: self.undo_playlist())
+        self.playlist_contents_tree.bind('<Control-y>', lambda e: self.redo_playlist())
 
         self.playlist_context_menu = tk.Menu(self.root, tearoff=0)
         self.playlist_context_menu.add_command(label="Search YouTube", command=lambda: self.open_playlist_link('youtube'))
@@ -316,195 +1051,434 @@ class MinimalPlaylistApp:
         self.load_details_stats()
 
     def load_overview_stats(self):
-        try:
-            if self.overview_text:
-                self.overview_text.delete(1.0, tk.END)
-
-                self.cursor_master.execute("SELECT COUNT(*) FROM Playlists")
-                total_records = self.cursor_master.fetchone()[0]
-
-                self.cursor_master.execute("SELECT COUNT(DISTINCT Artist) FROM Playlists WHERE Artist IS NOT NULL AND Artist != ''")
-                unique_artists = self.cursor_master.fetchone()[0]
-
-                self.cursor_master.execute("SELECT COUNT(DISTINCT Title) FROM Playlists WHERE Title IS NOT NULL AND Title != ''")
-                unique_titles = self.cursor_master.fetchone()[0]
-
-                self.cursor_master.execute("SELECT COUNT(DISTINCT Label) FROM Playlists WHERE Label IS NOT NULL AND Label != ''")
-                unique_labels = self.cursor_master.fetchone()[0]
-
-                self.cursor_master.execute("SELECT COUNT(DISTINCT DJ) FROM Playlists WHERE DJ IS NOT NULL AND DJ != ''")
-                unique_djs = self.cursor_master.fetchone()[0]
-
-                self.cursor_master.execute("SELECT COUNT(DISTINCT Club) FROM Playlists WHERE Club IS NOT NULL AND Club != ''")
-                unique_clubs = self.cursor_master.fetchone()[0]
-
-                self.cursor_master.execute("SELECT COUNT(DISTINCT Town) FROM Playlists WHERE Town IS NOT NULL AND Town != ''")
-                unique_towns = self.cursor_master.fetchone()[0]
-
-                self.cursor_master.execute("SELECT COUNT(DISTINCT Country) FROM Playlists WHERE Country IS NOT NULL AND Country != ''")
-                unique_countries = self.cursor_master.fetchone()[0]
+        if not self.overview_text:
+            print("Warning: self.overview_text not initialized.")
+            return
+        self.overview_text.delete(1.0, tk.END)
 
-                self.cursor_master.execute("SELECT MIN(Date), MAX(Date) FROM Playlists WHERE Date IS NOT NULL AND Date != ''")
-                date_range = self.cursor_master.fetchone()
+        counts = self.field_counts
+        total_records = self.total_records
+        dates = [str(d) for d in counts['Date']]
 
-                overview = f"""
+        overview = f"""
 DATABASE OVERVIEW
 {'='*50}
 
 Total Entities: {total_records:,}
 
 UNIQUE ENTITIES:
-• Artists: {unique_artists:,}
-• Song Titles: {unique_titles:,}
-• Record Labels: {unique_labels:,}
-• DJs: {unique_djs:,}
-• Clubs/Venues: {unique_clubs:,}
-• Towns/Cities: {unique_towns:,}
-• Countries: {unique_countries:,}
+• Artists: {len(counts['Artist']):,}
+• Song Titles: {len(counts['Title']):,}
+• Record Labels: {len(counts['Label']):,}
+• DJs: {len(counts['DJ']):,}
+• Clubs/Venues: {len(counts['Club']):,}
+• Towns/Cities: {len(counts['Town']):,}
+• Countries: {len(counts['Country']):,}
 
 DATE RANGE:
-• Earliest: {date_range[0] if date_range[0] else 'N/A'}
-• Latest: {date_range[1] if date_range[1] else 'N/A'}
+• Earliest: {min(dates) if dates else 'N/A'}
+• Latest: {max(dates) if dates else 'N/A'}
 
 DATA COMPLETENESS:
 """
 
-                fields = ['Artist', 'Title', 'Label', 'DJ', 'Club', 'Venue', 'Town', 'Country', 'Date']
-                for field in fields:
-                    self.cursor_master.execute(f"SELECT COUNT(*) FROM Playlists WHERE {field} IS NOT NULL AND {field} != ''")
-                    filled = self.cursor_master.fetchone()[0]
-                    percentage = (filled / total_records * 100) if total_records > 0 else 0
-                    overview += f"• {field}: {filled:,} ({percentage:.1f}%)\n"
+        for field in STAT_FIELDS:
+            filled = sum(counts[field].values())
+            percentage = (filled / total_records * 100) if total_records > 0 else 0
+            overview += f"• {field}: {filled:,} ({percentage:.1f}%)\n"
 
-                self.overview_text.insert(tk.END, overview)
-            else:
-                print("Warning: self.overview_text not initialized.")
-        except sqlite3.Error as e:
-            if self.overview_text:
-                self.overview_text.insert(tk.END, f"Error loading statistics: {str(e)}")
-            else:
-                messagebox.showerror("Statistics Error", f"Error loading statistics and UI not ready: {str(e)}")
+        self.overview_text.insert(tk.END, overview)
 
 
     def load_toplists_stats(self):
-        try:
-            if not self.top_artists_tree or not self.top_labels_tree or not self.top_djs_tree:
-                print("Warning: Toplists Treeviews not initialized.")
-                return
+        if not self.top_artists_tree or not self.top_labels_tree or not self.top_djs_tree:
+            print("Warning: Toplists Treeviews not initialized.")
+            return
 
-            for item in self.top_artists_tree.get_children():
-                self.top_artists_tree.delete(item)
-            for item in self.top_labels_tree.get_children():
-                self.top_labels_tree.delete(item)
-            for item in self.top_djs_tree.get_children():
-                self.top_djs_tree.delete(item)
+        start = time.perf_counter(); rows = 0
+        for field, tree in [('Artist', self.top_artists_tree), ('Label', self.top_labels_tree), ('DJ', self.top_djs_tree)]:
+            tree.delete(*tree.get_children())
+            for value, count in self.field_counts[field].most_common(50):
+                tree.insert('', 'end', values=(value, count)); rows += 1
+        PROFILER.record('treeview', 'load_toplists_stats', start, rows=rows)
 
-            self.cursor_master.execute('SELECT Artist, COUNT(*) as count FROM Playlists WHERE Artist IS NOT NULL AND Artist != "" GROUP BY Artist ORDER BY count DESC LIMIT 50')
-            for artist, count in self.cursor_master.fetchall():
-                self.top_artists_tree.insert('', 'end', values=(artist, count))
+    def load_details_stats(self):
+        if not self.details_text:
+            print("Warning: self.details_text not initialized.")
+            return
+        self.details_text.delete(1.0, tk.END)
 
-            self.cursor_master.execute('SELECT Label, COUNT(*) as count FROM Playlists WHERE Label IS NOT NULL AND Label != "" GROUP BY Label ORDER BY count DESC LIMIT 50')
-            for label, count in self.cursor_master.fetchall():
-                self.top_labels_tree.insert('', 'end', values=(label, count))
+        counts = self.field_counts
+        details = "DETAILED STATISTICS\n" + "="*50 + "\n\n"
 
-            self.cursor_master.execute('SELECT DJ, COUNT(*) as count FROM Playlists WHERE DJ IS NOT NULL AND DJ != "" GROUP BY DJ ORDER BY count DESC LIMIT 50')
-            for dj, count in self.cursor_master.fetchall():
-                self.top_djs_tree.insert('', 'end', values=(dj, count))
+        details += "COUNTRY BREAKDOWN:\n" + "-"*30 + "\n"
+        for country, count in counts['Country'].most_common():
+            details += f"{country:<20} {count:>6,}\n"
 
-        except sqlite3.Error as e:
-            messagebox.showerror("Statistics Error", str(e))
+        details += "\n\nTOP CLUBS/VENUES:\n" + "-"*30 + "\n"
+        for club, count in counts['Club'].most_common(30):
+            details += f"{club:<30} {count:>6,}\n"
 
-    def load_details_stats(self):
-        try:
-            if self.details_text:
-                self.details_text.delete(1.0, tk.END)
+        details += "\n\nTOP TOWNS/CITIES:\n" + "-"*30 + "\n"
+        for town, count in counts['Town'].most_common(30):
+            details += f"{town:<25} {count:>6,}\n"
 
-                details = "DETAILED STATISTICS\n" + "="*50 + "\n\n"
+        details += "\n\nYEAR BREAKDOWN:\n" + "-"*30 + "\n"
+        date_counts = [(str(d), c) for d, c in counts['Date'].items()]
 
-                details += "COUNTRY BREAKDOWN:\n" + "-"*30 + "\n"
-                self.cursor_master.execute('SELECT Country, COUNT(*) as count FROM Playlists WHERE Country IS NOT NULL AND Country != "" GROUP BY Country ORDER BY count DESC')
-                for country, count in self.cursor_master.fetchall():
-                    details += f"{country:<20} {count:>6,}\n"
+        sample_dates = [d for d, _ in date_counts[:10]]
+        if sample_dates:
+            details += f"Sample dates: {', '.join(sample_dates[:5])}\n\n"
 
-                details += "\n\nTOP CLUBS/VENUES:\n" + "-"*30 + "\n"
-                self.cursor_master.execute('SELECT Club, COUNT(*) as count FROM Playlists WHERE Club IS NOT NULL AND Club != "" GROUP BY Club ORDER BY count DESC LIMIT 30')
-                for club, count in self.cursor_master.fetchall():
-                    details += f"{club:<30} {count:>6,}\n"
+        try:
+            year_data = {}
+            # Try the year at the end of the date, then at the start, then anywhere in it
+            for extract in (lambda d: d[-4:], lambda d: d[:4]):
+                for date_str, count in date_counts:
+                    year = extract(date_str) if len(date_str) >= 4 else ''
+                    if year and year.isdigit() and 1900 <= int(year) <= 2030:
+                        year_data[year] = year_data.get(year, 0) + count
+                if year_data: break
+
+            if not year_data:
+                year_pattern = re.compile(r'\b(19|20)\d{2}\b')
+
+                for date_str, count in date_counts:
+                    match = year_pattern.search(date_str)
+                    if match:
+                        year = match.group()
+                        year_data[year] = year_data.get(year, 0) + count
+
+            if year_data:
+                for year in sorted(year_data.keys(), reverse=True):
+                    details += f"{year:<10} {year_data[year]:>6,}\n"
+            else:
+                details += "No recognizable year data found in date fields\n"
 
-                details += "\n\nTOP TOWNS/CITIES:\n" + "-"*30 + "\n"
-                self.cursor_master.execute('SELECT Town, COUNT(*) as count FROM Playlists WHERE Town IS NOT NULL AND Town != "" GROUP BY Town ORDER BY count DESC LIMIT 30')
-                for town, count in self.cursor_master.fetchall():
-                    details += f"{town:<25} {count:>6,}\n"
+        except Exception as e:
+            details += f"Error parsing dates: {str(e)}\n"
 
-                details += "\n\nYEAR BREAKDOWN:\n" + "-"*30 + "\n"
-                year_data = {}
+        common_dates = counts['Date'].most_common(10)
+        if common_dates:
+            details += f"\nMost common date values:\n"
+            for date_val, count in common_dates:
+                details += f"  '{date_val}' appears {count} times\n"
 
-                self.cursor_master.execute("SELECT DISTINCT Date FROM Playlists WHERE Date IS NOT NULL AND Date != '' LIMIT 10")
-                sample_dates = [row[0] for row in self.cursor_master.fetchall()]
+        self.details_text.insert(tk.END, details)
 
-                if sample_dates:
-                    details += f"Sample dates: {', '.join(sample_dates[:5])}\n\n"
+    def refresh_stats(self):
+        self.load_aggregates()
+        self.render_stats()
+        self.save_startup_snapshot()
+        messagebox.showinfo("Statistics", "Statistics refreshed successfully!")
 
+    def render_stats(self):
+        self.load_overview_stats()
+        self.load_toplists_stats()
+        self.load_details_stats()
+
+    # --- Methods for Change Tracking ---
+    def load_aggregates(self):
+        """Rebuild the per-field value counts from a full scan of every mounted archive (in parallel)."""
+        try:
+            if len(self.archives) > 1:
+                results = self.on_each_archive(lambda name, conn: count_archive(conn))
+            else:
+                results = [count_archive(self.conn_master)]
+            self.store_aggregates(results)
+        except sqlite3.Error as e:
+            messagebox.showerror("Statistics Error", f"Error loading statistics: {str(e)}")
+
+    def store_aggregates(self, results):
+        """Replace the cached counts with per-archive (total, counts) results from count_archive."""
+        self.total_records = sum(total for total, _ in results)
+        for field in STAT_FIELDS:
+            self.field_counts[field] = Counter()
+            for _, counts in results: self.field_counts[field].update(counts[field])
+
+    def rebuild_aggregates(self):
+        """Recount every archive on a worker thread, then install the counts and refresh the views that show them.
+
+        The master is counted inside one read transaction together with its changelog high-water mark, so
+        changes made while the scan runs are picked up by the next delta rather than counted twice.
+        """
+        paths = [path for _, path in self.archives]
+        self.aggregates_pending = True
+
+        def count_path(path):
+            conn = open_archive_reader(path)
+            try:
+                if path != MASTER_DB_FILE:
+                    return count_archive(conn), None
+                conn.execute("BEGIN")
                 try:
-                    self.cursor_master.execute('SELECT SUBSTR(Date, -4) as year, COUNT(*) as count FROM Playlists WHERE Date IS NOT NULL AND Date != "" AND LENGTH(Date) >= 4 GROUP BY year ORDER BY year DESC')
-                    results = self.cursor_master.fetchall()
-                    for year, count in results:
-                        if year and year.isdigit() and 1900 <= int(year) <= 2030:
-                            year_data[year] = year_data.get(year, 0) + count
-
-                    if not year_data:
-                        self.cursor_master.execute('SELECT SUBSTR(Date, 1, 4) as year, COUNT(*) as count FROM Playlists WHERE Date IS NOT NULL AND Date != "" AND LENGTH(Date) >= 4 GROUP BY year ORDER BY year DESC')
-                        results = self.cursor_master.fetchall()
-                        for year, count in results:
-                            if year and year.isdigit() and 1900 <= int(year) <= 2030:
-                                year_data[year] = year_data.get(year, 0) + count
-
-                    if not year_data:
-                        self.cursor_master.execute("SELECT Date FROM Playlists WHERE Date IS NOT NULL AND Date != ''")
-                        all_dates = self.cursor_master.fetchall()
-
-                        import re
-                        year_pattern = re.compile(r'\b(19|20)\d{2}\b')
-
-                        for (date_str,) in all_dates:
-                            match = year_pattern.search(str(date_str))
-                            if match:
-                                year = match.group()
-                                year_data[year] = year_data.get(year, 0) + 1
-
-                    if year_data:
-                        for year in sorted(year_data.keys(), reverse=True):
-                            details += f"{year:<10} {year_data[year]:>6,}\n"
-                    else:
-                        details += "No recognizable year data found in date fields\n"
-
-                except Exception as e:
-                    details += f"Error parsing dates: {str(e)}\n"
+                    log_seq = conn.execute("SELECT MAX(seq) FROM playlists_changelog").fetchone()[0] or 0
+                except sqlite3.Error:
+                    log_seq = None
+                return count_archive(conn), log_seq
+            finally:
+                conn.close()
+
+        def work():
+            try:
+                with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+                    counted = list(pool.map(count_path, paths))
+            except sqlite3.Error as e:
+                message = str(e)
+                self.root.after(0, lambda: (setattr(self, 'aggregates_pending', False),
+                                            messagebox.showerror("Statistics Error", f"Error loading statistics: {message}")))
+                return
+            self.root.after(0, install, counted)
+
+        def install(counted):
+            self.aggregates_pending = False
+            if paths != [path for _, path in self.archives]:
+                return  # Remounted meanwhile; remount_archives recounted the new set
+            self.store_aggregates([result for result, _ in counted])
+            log_seq = counted[0][1]
+            if log_seq is not None and self.master_state is not None:
+                self.master_state['log_seq'], self.master_state['count'] = log_seq, counted[0][0][0]
+            self.populate_dropdowns()
+            self.render_stats()
+            self.save_startup_snapshot()
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def apply_delta(self, changes):
+        """Patch the per-field value counts with ('I' | 'D', row) changes, row ordered as STAT_FIELDS."""
+        for op, row in changes:
+            sign = 1 if op == 'I' else -1
+            self.total_records += sign
+            for field, value in zip(STAT_FIELDS, row):
+                if value is None or value == '': continue
+                counter = self.field_counts[field]
+                counter[value] += sign
+                if counter[value] <= 0: del counter[value]
+
+    def install_change_tracking(self):
+        """Record inserted/updated/deleted Playlists rows in playlists_changelog (best effort; the master may be read-only).
+
+        playlists_changelog_id holds a random id for this database, so a changelog is only trusted as a
+        continuation of ours when it comes from the same database rather than a replacement file.
+        """
+        cols = ", ".join(STAT_FIELDS)
+        new_vals = ", ".join(f"NEW.{c}" for c in STAT_FIELDS)
+        old_vals = ", ".join(f"OLD.{c}" for c in STAT_FIELDS)
+        try:
+            with self.conn_master:
+                self.conn_master.execute("CREATE TABLE IF NOT EXISTS playlists_changelog_id (db_id TEXT NOT NULL)")
+                self.conn_master.execute("INSERT INTO playlists_changelog_id (db_id) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM playlists_changelog_id)",
+                                         (os.urandom(16).hex(),))
+                self.conn_master.execute(f"""
+                    CREATE TABLE IF NOT EXISTS playlists_changelog (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        op TEXT NOT NULL,
+                        row_id INTEGER,
+                        {cols}
+                    )
+                """)
+                self.conn_master.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS playlists_log_insert AFTER INSERT ON Playlists BEGIN
+                        INSERT INTO playlists_changelog (op, row_id, {cols}) VALUES ('I', NEW.rowid, {new_vals});
+                    END
+                """)
+                self.conn_master.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS playlists_log_delete AFTER DELETE ON Playlists BEGIN
+                        INSERT INTO playlists_changelog (op, row_id, {cols}) VALUES ('D', OLD.rowid, {old_vals});
+                    END
+                """)
+                # An update is logged as a delete of the old values followed by an insert of the new ones
+                self.conn_master.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS playlists_log_update AFTER UPDATE ON Playlists BEGIN
+                        INSERT INTO playlists_changelog (op, row_id, {cols}) VALUES ('D', OLD.rowid, {old_vals});
+                        INSERT INTO playlists_changelog (op, row_id, {cols}) VALUES ('I', NEW.rowid, {new_vals});
+                    END
+                """)
+        except sqlite3.Error as e:
+            print(f"Note: change tracking not installed on master database: {e}")
 
+    def index_master_for_generator(self):
+        """Add a covering index for the generator's Country-filtered pool query (best effort, on a worker thread).
+
+        With it the pool is grouped straight from the index instead of sorting every matching row. Building it
+        takes a couple of seconds on a large master, and is a no-op once the index exists.
+        """
+        def work():
+            try:
+                conn = sqlite3.connect(MASTER_DB_FILE)
                 try:
-                    self.cursor_master.execute("SELECT Date, COUNT(*) FROM Playlists WHERE Date IS NOT NULL AND Date != '' GROUP BY Date ORDER BY COUNT(*) DESC LIMIT 10")
-                    common_dates = self.cursor_master.fetchall()
-                    if common_dates:
-                        details += f"\nMost common date values:\n"
-                        for date_val, count in common_dates:
-                            details += f"  '{date_val}' appears {count} times\n"
-                except:
-                    pass
+                    with conn:
+                        conn.execute("CREATE INDEX IF NOT EXISTS playlists_generator_idx ON Playlists (Country, Artist, Title, Date, DJ)")
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"Note: generator index not created on master database: {e}")
 
-                self.details_text.insert(tk.END, details)
-            else:
-                print("Warning: self.details_text not initialized.")
+        threading.Thread(target=work, daemon=True).start()
+
+    def trim_changelog(self):
+        """Drop changelog entries already folded into the cached counts, keeping the last one as the continuity mark.
+
+        Call before read_master_state(): the delete changes the file's mtime, which must not look like a new change.
+        """
+        try:
+            with self.conn_master:
+                self.conn_master.execute("DELETE FROM playlists_changelog WHERE seq < (SELECT MAX(seq) FROM playlists_changelog)")
         except sqlite3.Error as e:
-            if self.details_text:
-                self.details_text.insert(tk.END, f"Error loading detailed statistics: {str(e)}")
-            else:
-                messagebox.showerror("Statistics Error", f"Error loading detailed statistics and UI not ready: {str(e)}")
+            print(f"Note: could not trim master changelog: {e}")
 
-    def refresh_stats(self):
-        self.load_overview_stats()
-        self.load_toplists_stats()
-        self.load_details_stats()
-        messagebox.showinfo("Statistics", "Statistics refreshed successfully!")
+    def read_master_state(self):
+        """Fingerprint of the master database: file identity, row count and changelog identity/high-water mark."""
+        try:
+            st = os.stat(MASTER_DB_FILE)
+            file_id = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            file_id = None
+        try:
+            self.cursor_master.execute("SELECT COUNT(*) FROM Playlists")
+            count = self.cursor_master.fetchone()[0]
+        except sqlite3.Error:
+            count = None
+        try:
+            self.cursor_master.execute("SELECT MAX(seq) FROM playlists_changelog")
+            log_seq = self.cursor_master.fetchone()[0] or 0
+            self.cursor_master.execute("SELECT db_id FROM playlists_changelog_id")
+            db_id = (self.cursor_master.fetchone() or (None,))[0]
+        except sqlite3.Error:
+            log_seq, db_id = None, None
+        return {'file': file_id, 'count': count, 'log_seq': log_seq, 'db_id': db_id}
+
+    def read_master_delta(self, prev):
+        """Changes since `prev` as [(op, row)], or None when only a full rebuild is safe.
+
+        Only a changelog from the same database (matching db_id) that reaches back to our high-water mark
+        is trusted. A replaced file, or a master where tracking could not be installed, gets a full rebuild:
+        rows edited in place can't be told apart from unchanged ones any other way.
+        """
+        if prev is None or prev['count'] is None or prev.get('db_id') is None:
+            return None
+        cols = ", ".join(STAT_FIELDS)
+        try:
+            self.cursor_master.execute("SELECT COUNT(*) FROM Playlists")
+            count = self.cursor_master.fetchone()[0]
+
+            self.cursor_master.execute("SELECT db_id FROM playlists_changelog_id")
+            if (self.cursor_master.fetchone() or (None,))[0] != prev['db_id']:
+                return None
+            self.cursor_master.execute("SELECT MIN(seq) FROM playlists_changelog")
+            min_seq = self.cursor_master.fetchone()[0]
+            # The changelog only continues ours if it reaches back to our high-water mark (trimming keeps that entry)
+            if min_seq is None:
+                if prev['log_seq']: return None
+            elif min_seq > prev['log_seq'] + 1:
+                return None
+            self.cursor_master.execute(f"SELECT op, {cols} FROM playlists_changelog WHERE seq > ? ORDER BY seq", (prev['log_seq'],))
+            changes = [(row[0], row[1:]) for row in self.cursor_master.fetchall()]
+        except sqlite3.Error:
+            return None
+
+        net = sum(1 if op == 'I' else -1 for op, _ in changes)
+        if prev['count'] + net != count:
+            return None
+        return changes
+
+    def check_master_changes(self):
+        try:
+            st = os.stat(MASTER_DB_FILE)
+            file_id = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            file_id = None
+        # While a full recount is running, later changes wait for it and are picked up as a delta afterwards
+        if file_id is not None and self.master_state is not None and file_id != self.master_state['file'] and not self.aggregates_pending:
+            self.refresh_from_master()
+        self.root.after(CHANGE_POLL_MS, self.check_master_changes)
+
+    def refresh_from_master(self):
+        """Reconnect to the (possibly replaced) master database and patch cached views with the delta."""
+        try:
+            self.conn_master.close()
+            self.conn_master = sqlite3.connect(MASTER_DB_FILE, factory=ProfiledConnection)
+            self.cursor_master = self.conn_master.cursor()
+        except sqlite3.Error as e:
+            print(f"Error reconnecting to master database: {e}")
+            return
+        self.prefetch_track_keys()
+        self.index_master_for_generator()
+
+        if len(self.archives) > 1: self.open_archives()
+        changes = self.read_master_delta(self.master_state)
+        if changes:
+            self.apply_delta(changes)
+        self.install_change_tracking()
+        self.trim_changelog()
+        self.master_state = self.read_master_state()
+
+        if changes != []:
+            self.first_page = None
+            if self.columnar is not None:
+                # Rows are kept in Date order, so rebuild rather than patch; SQL serves searches meanwhile
+                self.columnar = None
+                threading.Thread(target=self._build_columnar, daemon=True).start()
+            self.load_data(self.last_query, self.last_params, self.last_limit, self.last_source)
+            if self.first_page is None: self.load_first_page()
+        if changes is None:
+            # A full recount takes seconds on a large archive; it installs the counts and saves the snapshot when done
+            self.rebuild_aggregates()
+            return
+        if changes:
+            self.populate_dropdowns()
+            self.render_stats()
+        self.save_startup_snapshot()
+
+    # --- Methods for Startup Snapshot ---
+    def load_first_page(self):
+        try:
+            self.first_page = self.query_archives("SELECT Artist, Title, Label, DJ, Club, Venue, Town, Country, Date FROM Playlists ORDER BY Date DESC LIMIT 500", [], 500)
+        except sqlite3.Error as e:
+            print(f"Error loading first page: {e}")
+
+    def restore_startup_snapshot(self):
+        """Restore dropdowns, statistics, change-tracking state and the first page from one file read."""
+        try:
+            with open(STARTUP_SNAPSHOT_FILE, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot['version'] != STARTUP_SNAPSHOT_VERSION or snapshot['fingerprint'] != self.archives_fingerprint():
+                return False
+            field_counts = {field: Counter(snapshot['field_counts'][field]) for field in STAT_FIELDS}
+            total_records, master_state, first_page = snapshot['total_records'], snapshot['master_state'], snapshot['first_page']
+        except FileNotFoundError:
+            return False
+        except (OSError, pickle.PickleError, EOFError, KeyError, TypeError, AttributeError) as e:
+            print(f"Note: ignoring unreadable startup snapshot: {e}")
+            return False
+
+        self.field_counts, self.total_records, self.first_page = field_counts, total_records, first_page
+        # The fingerprint matched, so only the file identity (e.g. inode after a copy) may be stale
+        st = os.stat(MASTER_DB_FILE)
+        self.master_state = dict(master_state, file=(st.st_ino, st.st_size, st.st_mtime_ns))
+        return True
+
+    def archives_fingerprint(self):
+        return tuple((path, master_fingerprint(path)) for _, path in self.archives)
+
+    def save_startup_snapshot(self):
+        if self.first_page is None or self.master_state is None:
+            return
+        snapshot = {
+            'version': STARTUP_SNAPSHOT_VERSION,
+            'fingerprint': self.archives_fingerprint(),
+            'field_counts': {field: dict(counts) for field, counts in self.field_counts.items()},
+            'total_records': self.total_records,
+            'master_state': self.master_state,
+            'first_page': self.first_page,
+        }
+        tmp_path = STARTUP_SNAPSHOT_FILE + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, STARTUP_SNAPSHOT_FILE)
+        except OSError as e:
+            print(f"Note: could not write startup snapshot: {e}")
 
     def create_search_controls(self, parent):
         self.search_vars = {
@@ -516,6 +1490,7 @@ DATA COMPLETENESS:
             'club': tk.StringVar(),
             'town': tk.StringVar(),
             'country': tk.StringVar(),
+            'source': tk.StringVar(),
         }
 
         row = 0
@@ -536,16 +1511,36 @@ DATA COMPLETENESS:
             self.dropdowns[var_name] = combo
             row += 1
 
+        # Only shown while several archives are mounted, like the Source column
+        source_label = ttk.Label(parent, text="Source:")
+        source_label.grid(row=row, column=0, sticky=tk.W, pady=2)
+        combo = ttk.Combobox(parent, textvariable=self.search_vars['source'], width=23, state="readonly")
+        combo.grid(row=row, column=1, sticky=(tk.W, tk.E), pady=2, padx=(5,0))
+        combo.bind('<<ComboboxSelected>>', lambda e: self.search())
+        self.dropdowns['source'] = combo
+        self.source_controls = (source_label, combo)
+        row += 1
+
         ttk.Button(parent, text="Search", command=self.search).grid(row=row, column=0, pady=10, sticky=tk.W)
         ttk.Button(parent, text="Clear", command=self.clear_search).grid(row=row, column=1, pady=10, sticky=tk.W)
         row += 1
 
+        self.columnar_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(parent, text="In-memory filtering", variable=self.columnar_var, command=self.toggle_columnar).grid(row=row, column=0, columnspan=2, sticky=tk.W, pady=(0,5))
+        row += 1
+
         ttk.Button(parent, text="Add to Playlist", command=self.add_to_playlist).grid(row=row, column=0, columnspan=2, pady=5, sticky=(tk.W, tk.E))
         row += 1
         ttk.Button(parent, text="Download Audio (MP3)", command=lambda: self.download_audio('search')).grid(row=row, column=0, columnspan=2, pady=5, sticky=(tk.W, tk.E))
         row += 1
         ttk.Button(parent, text="Export CSV", command=self.export_csv).grid(row=row, column=0, columnspan=2, pady=5, sticky=(tk.W, tk.E))
         row += 1
+        ttk.Button(parent, text="Look Up Release Info", command=self.lookup_metadata).grid(row=row, column=0, columnspan=2, pady=5, sticky=(tk.W, tk.E))
+        row += 1
+        ttk.Button(parent, text="Music Library...", command=self.show_library_window).grid(row=row, column=0, columnspan=2, pady=5, sticky=(tk.W, tk.E))
+        row += 1
+        ttk.Button(parent, text="Archives...", command=self.show_archives_window).grid(row=row, column=0, columnspan=2, pady=5, sticky=(tk.W, tk.E))
+        row += 1
 
         # --- Project Team button ---
         ttk.Button(parent, text="Project Team", command=self.show_credits_window).grid(row=row, column=0, columnspan=2, pady=(15, 5), sticky=(tk.W, tk.E))
@@ -554,16 +1549,13 @@ DATA COMPLETENESS:
     # --- Methods for Download Logic ---
     def download_audio(self, source='search'):
         if source == 'search':
-            artist, title = self.get_selected_track()
+            tree, fields = self.tree, ['artist', 'title', 'label', 'dj', 'club', 'venue', 'town', 'country', 'date']
         else:
-            selection = self.playlist_contents_tree.selection()
-            if not selection:
-                messagebox.showwarning("No Selection", "Please select a track first.")
-                return
-            values = self.playlist_contents_tree.item(selection[0], 'values')
-            artist, title = values[0], values[1]
+            tree, fields = self.playlist_contents_tree, ['artist', 'title', 'label', 'dj', 'club', 'town', 'country', 'date']
+        tracks = [dict(zip(fields, tree.item(iid, 'values'))) for iid in tree.selection()]
+        tracks = [t for t in tracks if t.get('artist') and t.get('title')]
 
-        if not artist or not title:
+        if not tracks:
             messagebox.showwarning("No Selection", "Please select a track first.")
             return
 
@@ -571,30 +1563,39 @@ DATA COMPLETENESS:
         if not download_path:
             return
 
-        threading.Thread(target=self._execute_download, args=(artist, title, download_path), daemon=True).start()
-
-    def _execute_download(self, artist, title, folder):
-        search_query = f"ytsearch1:{artist} {title}"
-        local_ffmpeg_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in locals() else os.getcwd()
-
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': f'{folder}/%(title)s.%(ext)s',
-            'ffmpeg_location': local_ffmpeg_dir, 
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'quiet': True,
-            'no_warnings': True
-        }
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([search_query])
-            messagebox.showinfo("Success", f"Download Complete:\n{artist} - {title}")
-        except Exception as e:
-            messagebox.showerror("Download Error", f"An error occurred: {str(e)}\n\nEnsure ffmpeg.exe is in the application folder.")
+        local_files = [self.library_file(track['artist'], track['title']) for track in tracks]
+        to_fetch = [track for track, local_file in zip(tracks, local_files) if not local_file]
+
+        # ffmpeg is only needed when something has to be fetched; library matches are plain copies
+        if self.download_pipeline is None:
+            self.download_pipeline = DownloadPipeline(find_ffmpeg())
+        if to_fetch and not self.download_pipeline.ffmpeg:
+            self.download_pipeline.ffmpeg = find_ffmpeg()
+            if not self.download_pipeline.ffmpeg:
+                messagebox.showerror("Download Error", "ffmpeg was not found.\n\nEnsure ffmpeg.exe is in the application folder.")
+                return
+
+        futures = [self.download_pipeline.copy(local_file, download_path) if local_file else self.download_pipeline.submit(track, download_path)
+                   for track, local_file in zip(tracks, local_files)]
+        pending = [len(futures)]
+
+        def count_done():
+            # Runs on the UI thread; completions arrive from fetch threads and the process pool's result thread
+            pending[0] -= 1
+            if pending[0] == 0:
+                self._report_downloads(tracks, futures, local_files)
+        for future in futures:
+            future.add_done_callback(lambda f: self.root.after(0, count_done))
+
+    def _report_downloads(self, tracks, futures, local_files):
+        """One summary for a batch; tracks with a local file were copied from the music library instead of fetched."""
+        names = [f"{t['artist']} - {t['title']}" + (" (from your music library)" if local else "") for t, local in zip(tracks, local_files)]
+        errors = [f"{name}: {f.exception()}" for name, f in zip(names, futures) if f.exception()]
+        done = len(futures) - len(errors)
+        if not errors:
+            messagebox.showinfo("Success", "Download Complete:\n" + "\n".join(names))
+        else:
+            messagebox.showerror("Download Error", f"{done} of {len(futures)} downloaded.\n\n" + "\n".join(errors))
 
     def show_credits_window(self):
         credits_window = tk.Toplevel(self.root)
@@ -611,59 +1612,185 @@ DATA COMPLETENESS:
         credits_canvas.pack(fill='both', expand=True, padx=10, pady=(0, 10))
 
         # --- Logic to read static credits from credits.json ---
-        static_credits_text = ""
+        lines = []
         try:
             with open(resource_path('credits.json'), 'r') as f:
                 data = json.load(f)
                 for category, names in data.items():
-                    static_credits_text += f"--- {category} ---\n\n"
-                    static_credits_text += "\n".join(names)
-                    static_credits_text += "\n\n\n"
+                    lines += [f"--- {category} ---", ""] + list(names) + ["", "", ""]
         except FileNotFoundError:
             print("Note: 'credits.json' file not found. Skipping static credits.")
         except json.JSONDecodeError:
-            static_credits_text = "Error: Could not read 'credits.json'.\nPlease check its formatting.\n\n\n"
-
-        # --- Get the dynamic DJ list from the database ---
-        dj_credits_text = ""
-        try:
-            self.cursor_master.execute("SELECT DISTINCT DJ FROM Playlists WHERE DJ IS NOT NULL AND DJ != '' ORDER BY DJ")
-            djs = [row[0] for row in self.cursor_master.fetchall()]
-
-            if djs:
-                dj_credits_text = "--- DJs ---\n\n"
-                formatted_lines = []
-                for i in range(0, len(djs), 2):
-                    left_dj = djs[i]
-                    right_dj = djs[i+1] if i + 1 < len(djs) else ""
-                    formatted_lines.append(f"{left_dj:<25}{right_dj}")
-                dj_credits_text += "\n".join(formatted_lines)
+            lines = ["Error: Could not read 'credits.json'.", "Please check its formatting.", "", "", ""]
+
+        # Only enough text items to fill the canvas are created; as one scrolls off the top it is
+        # moved to the bottom and given the next line, so each frame costs the same however many DJs there are
+        font = tkfont.Font(family='Consolas', size=10)
+        line_height = font.metrics('linespace')
+        credits_canvas.update_idletasks()
+        width = credits_canvas.winfo_width() if credits_canvas.winfo_width() > 1 else 430
+        height = credits_canvas.winfo_height() if credits_canvas.winfo_height() > 1 else 460
+        pool_size = height // line_height + 2
+        roll = {'canvas': credits_canvas, 'font': font, 'lines': lines, 'loading': True, 'line_height': line_height, 'pool_size': pool_size,
+                'char_width': font.measure('0'), 'width': width, 'x': 0, 'top': height, 'next_line': pool_size}
+        roll['items'] = deque(credits_canvas.create_text(0, height + k * line_height, text=lines[k] if k < len(lines) else '',
+                                                         fill='white', font=font, anchor='nw', tags='credit') for k in range(pool_size))
+        self.center_credits(roll)
+
+        def show_djs(dj_lines):
+            roll['lines'] = lines + dj_lines
+            roll['loading'] = False
+            # Items already past the end of the static credits were left blank; give them their DJ lines
+            first = roll['next_line'] - pool_size
+            try:
+                for j, item in enumerate(roll['items']):
+                    if len(lines) <= first + j < len(roll['lines']): credits_canvas.itemconfigure(item, text=roll['lines'][first + j])
+            except tk.TclError:
+                return
+            self.center_credits(roll)
+        self.load_credit_djs(show_djs)
+        credits_canvas.after(1, self.scroll_credits, roll)
+
+    def load_credit_djs(self, callback):
+        """Pass the DJ credit lines to `callback` on the UI thread; they are formatted off it and cached."""
+        if self.credit_dj_lines is not None:
+            callback(self.credit_dj_lines)
+            return
+        djs = list(self.field_counts['DJ'])  # Same DJ set as the dropdowns, already in memory
+
+        def build():
+            names = sorted((dj for dj in djs if dj), key=str)
+            if names:
+                dj_lines = ["--- DJs ---", ""] + [f"{names[i]:<25}{names[i + 1] if i + 1 < len(names) else ''}" for i in range(0, len(names), 2)]
             else:
-                dj_credits_text = "--- DJs ---\n\nNo DJs found in the database."
-        except sqlite3.Error as e:
-            dj_credits_text = f"Error fetching DJs: {e}"
-
-        full_credits_text = static_credits_text + dj_credits_text
-        canvas_width = 450
-        text_item_id = credits_canvas.create_text(
-            canvas_width / 2, 500,
-            text=full_credits_text,
-            fill='white',
-            font=('Consolas', 10),
-            anchor='n',
-            width=canvas_width - 20
-        )
-        credits_canvas.after(1, self.scroll_credits, credits_canvas, text_item_id)
-
-    def scroll_credits(self, canvas, text_id):
-        try:
-            canvas.move(text_id, 0, -1)
-            x0, y0, x1, y1 = canvas.bbox(text_id)
-            if y1 > 0:
-                canvas.after(30, self.scroll_credits, canvas, text_id)
+                dj_lines = ["--- DJs ---", "", "No DJs found in the database."]
+            self.root.after(0, finish, dj_lines)
+
+        def finish(dj_lines):
+            self.credit_dj_lines = dj_lines
+            callback(dj_lines)
+        threading.Thread(target=build, daemon=True).start()
+
+    def center_credits(self, roll):
+        """Centre the credits block (lines stay left-aligned, as the columns rely on a monospaced font)."""
+        longest = max((len(line) for line in roll['lines']), default=0) * roll['char_width']
+        x = max(10, (roll['width'] - longest) // 2)
+        try:
+            roll['canvas'].move('credit', x - roll['x'], 0)
+        except tk.TclError:
+            return
+        roll['x'] = x
+
+    def scroll_credits(self, roll):
+        canvas, lines, line_height = roll['canvas'], roll['lines'], roll['line_height']
+        try:
+            # Hold the roll rather than run past the end of the text while the DJ list is still loading
+            if roll['loading'] and roll['next_line'] >= len(lines):
+                canvas.after(30, self.scroll_credits, roll)
+                return
+            canvas.move('credit', 0, -1)
+            roll['top'] -= 1
+            if roll['top'] <= -line_height:
+                item = roll['items'].popleft()
+                canvas.move(item, 0, roll['pool_size'] * line_height)
+                canvas.itemconfigure(item, text=lines[roll['next_line']] if roll['next_line'] < len(lines) else '')
+                roll['items'].append(item)
+                roll['top'] += line_height
+                roll['next_line'] += 1
+            if roll['next_line'] - roll['pool_size'] < len(lines):
+                canvas.after(30, self.scroll_credits, roll)
         except tk.TclError:
             pass
 
+    # --- Methods for Instrumentation ---
+    def check_event_loop(self, scheduled):
+        """Heartbeat on the Tk event loop; a late tick means the UI thread was blocked."""
+        now = time.perf_counter()
+        late_ms = (now - scheduled) * 1000 - STALL_TICK_MS
+        if late_ms >= STALL_THRESHOLD_MS:
+            PROFILER.record('stall', 'event_loop', scheduled + STALL_TICK_MS / 1000, late_ms=round(late_ms, 1))
+        self.root.after(STALL_TICK_MS, self.check_event_loop, time.perf_counter())
+
+    def show_developer_panel(self):
+        panel = tk.Toplevel(self.root)
+        panel.title("Developer Panel")
+        panel.geometry("900x500")
+
+        controls = ttk.Frame(panel, padding="5")
+        controls.pack(fill='x')
+        summary_label = ttk.Label(panel, padding="5")
+        summary_label.pack(fill='x')
+
+        columns = ('Category', 'Name', 'ms', 'Detail')
+        tree = ttk.Treeview(panel, columns=columns, show='headings')
+        widths = {'Category': 80, 'Name': 160, 'ms': 70, 'Detail': 560}
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=widths[col], anchor='e' if col == 'ms' else 'w')
+        scroll = ttk.Scrollbar(panel, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scroll.pack(side='right', fill='y')
+
+        threshold_var = tk.StringVar(value=str(PROFILER.slow_query_ms))
+        shown = []
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            events = list(PROFILER.events)
+            shown[:] = events[::-1]
+            for event in shown:
+                args = event['args']
+                if event['cat'] == 'sql':
+                    detail = ' '.join(args['sql'].split())
+                    if args.get('slow'): detail = "[SLOW] " + detail
+                elif event['cat'] == 'treeview':
+                    detail = f"{args['rows']} rows inserted"
+                else:
+                    detail = f"event loop blocked {args['late_ms']} ms"
+                tree.insert('', 'end', values=(event['cat'], event['name'], f"{event['dur'] * 1000:.1f}", detail))
+            sql = [e for e in events if e['cat'] == 'sql']
+            ui = [e for e in events if e['cat'] == 'treeview']
+            summary_label.config(text=f"SQL: {len(sql)} statements, {sum(e['dur'] for e in sql) * 1000:.0f} ms, "
+                                      f"{sum(1 for e in sql if e['args'].get('slow'))} slow   |   "
+                                      f"Treeview: {sum(e['args']['rows'] for e in ui):,} rows, {sum(e['dur'] for e in ui) * 1000:.0f} ms   |   "
+                                      f"Stalls: {sum(1 for e in events if e['cat'] == 'stall')}")
+
+        def apply_threshold():
+            try:
+                PROFILER.slow_query_ms = float(threshold_var.get())
+            except ValueError:
+                threshold_var.set(str(PROFILER.slow_query_ms))
+
+        def clear():
+            PROFILER.clear(); refresh()
+
+        def export(kind):
+            path = filedialog.asksaveasfilename(parent=panel, defaultextension=".json", filetypes=[("JSON files", "*.json")],
+                                                initialfile="trace.json" if kind == 'trace' else "profile.json")
+            if path:
+                if kind == 'trace': PROFILER.export_chrome_trace(path)
+                else: PROFILER.export_json(path)
+
+        def show_plan(event):
+            selection = tree.selection()
+            if not selection: return
+            entry = shown[tree.index(selection[0])]
+            if entry['cat'] == 'sql':
+                plan = "\n".join(entry['args'].get('plan') or ["(plan captured for slow queries only)"])
+                messagebox.showinfo("Query", f"{entry['args']['sql'].strip()}\n\nParams: {entry['args'].get('params')!r}\n\nPlan:\n{plan}", parent=panel)
+
+        ttk.Button(controls, text="Refresh", command=refresh).pack(side='left', padx=(0,5))
+        ttk.Button(controls, text="Clear", command=clear).pack(side='left', padx=(0,5))
+        ttk.Button(controls, text="Export JSON", command=lambda: export('json')).pack(side='left', padx=(0,5))
+        ttk.Button(controls, text="Export Chrome Trace", command=lambda: export('trace')).pack(side='left', padx=(0,15))
+        ttk.Label(controls, text="Slow query ms:").pack(side='left')
+        threshold_entry = ttk.Entry(controls, textvariable=threshold_var, width=8)
+        threshold_entry.pack(side='left', padx=(5,0))
+        threshold_entry.bind('<Return>', lambda e: apply_threshold())
+        tree.bind('<Double-1>', show_plan)
+        refresh()
+
     def create_results_table(self, parent):
         self.results_label = ttk.Label(parent, text="All Records")
         self.results_label.grid(row=0, column=0, sticky=tk.W, pady=(0,5))
@@ -673,10 +1800,11 @@ DATA COMPLETENESS:
         table_frame.columnconfigure(0, weight=1)
         table_frame.rowconfigure(0, weight=1)
 
-        columns = ('Artist', 'Title', 'Label', 'DJ', 'Club', 'Venue', 'Town', 'Country', 'Date')
+        columns = ('Artist', 'Title', 'Label', 'DJ', 'Club', 'Venue', 'Town', 'Country', 'Date', 'Source', 'Release Label', 'Cat No', 'Year')
         self.tree = ttk.Treeview(table_frame, columns=columns, show='headings', height=20)
 
-        widths = {'Artist': 120, 'Title': 150, 'Label': 120, 'DJ': 100, 'Club': 80, 'Venue': 80, 'Town': 80, 'Country': 80, 'Date': 80}
+        widths = {'Artist': 120, 'Title': 150, 'Label': 120, 'DJ': 100, 'Club': 80, 'Venue': 80, 'Town': 80, 'Country': 80, 'Date': 80, 'Source': 90,
+                  'Release Label': 120, 'Cat No': 80, 'Year': 50}
         for col in columns:
             self.tree.heading(col, text=col, command=lambda c=col: self.sort_column(c))
             self.tree.column(col, width=widths[col], minwidth=50)
@@ -691,6 +1819,7 @@ DATA COMPLETENESS:
 
         self.tree.bind('<Double-1>', self.on_double_click)
         self.tree.bind('<Button-3>', self.show_context_menu)
+        self.tree.tag_configure('in_library', background='#e2f2e2')
 
         self.context_menu = tk.Menu(self.root, tearoff=0)
         self.context_menu.add_command(label="Add to Playlist", command=self.add_to_playlist)
@@ -698,52 +1827,112 @@ DATA COMPLETENESS:
         self.context_menu.add_command(label="Search YouTube", command=lambda: self.open_link('youtube'))
         self.context_menu.add_command(label="Search Spotify", command=lambda: self.open_link('spotify'))
         self.context_menu.add_command(label="Search Discogs", command=lambda: self.open_link('discogs'))
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Look Up Release Info", command=self.lookup_metadata)
+        self.context_menu.add_command(label="Open Artwork", command=self.open_artwork)
 
     def populate_dropdowns(self):
+        self.credit_dj_lines = None  # Called whenever the value counts change
         dropdown_fields = ['DJ', 'Club', 'Town', 'Country']
         for field in dropdown_fields:
             if field.lower() in self.dropdowns:
                 combo = self.dropdowns[field.lower()]
-                try:
-                    query = f"SELECT DISTINCT {field} FROM Playlists WHERE {field} IS NOT NULL AND {field} != '' ORDER BY {field}"
-                    self.cursor_master.execute(query)
-                    values = [row[0] for row in self.cursor_master.fetchall()]
-                    combo['values'] = [''] + values
-                except sqlite3.Error as e:
-                    print(f"Error populating dropdown for {field}: {e}")
-                    combo['values'] = ['']
+                combo['values'] = [''] + sorted(self.field_counts[field], key=str)
+        if 'source' in self.dropdowns:
+            self.dropdowns['source']['values'] = [''] + [name for name, _ in self.archives]
 
 
-    def load_data(self, query=None, params=None):
+    def load_data(self, query=None, params=None, limit=None, source=None):
         for item in self.tree.get_children():
             self.tree.delete(item)
+        self.result_keys = {}
 
         select_cols = "Artist, Title, Label, DJ, Club, Venue, Town, Country, Date"
+        self.last_query, self.last_params, self.last_limit, self.last_source = query, params, limit, source
         if query is None:
             query = f"SELECT {select_cols} FROM Playlists ORDER BY Date DESC LIMIT 500"
-            params = []
+            params, limit = [], 500
 
         try:
-            self.cursor_master.execute(query, params)
-            rows = self.cursor_master.fetchall()
+            if self.last_query is None and self.first_page is not None:
+                rows = self.first_page
+            else:
+                rows = self.query_archives(query, params, limit, source)
+                if self.last_query is None: self.first_page = rows
 
+            start = time.perf_counter(); in_library = 0
             for row in rows:
                 display_row = [str(item) if item is not None else '' for item in row]
-                self.tree.insert('', 'end', values=display_row)
+                tags = self.library_tags(display_row[0], display_row[1])
+                in_library += bool(tags)
+                key = normalize_track(display_row[0], display_row[1])
+                iid = self.tree.insert('', 'end', values=display_row + self.metadata_values(key), tags=tags)
+                self.result_keys.setdefault(key, []).append(iid)
+            PROFILER.record('treeview', 'load_data', start, rows=len(rows))
 
             count = len(rows)
-            self.results_label.config(text=f"Results: {count} records")
+            self.results_label.config(text=f"Results: {count} records" + (f" ({in_library} in library)" if in_library else ""))
 
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", str(e))
 
+    def load_columnar(self, equals, contains):
+        """Same as load_data, but filtered against the in-memory snapshot; values are already display strings."""
+        self.tree.delete(*self.tree.get_children())
+        self.result_keys = {}
+        self.last_query, self.last_params, self.last_limit, self.last_source = None, None, None, None
+
+        indices = self.columnar.filter(equals, contains)
+        if not equals and not contains:
+            indices = indices[:500]
+        rows = self.columnar.rows(indices)
+
+        start = time.perf_counter(); in_library = 0
+        for row in rows:
+            tags = self.library_tags(row[0], row[1])
+            in_library += bool(tags)
+            key = normalize_track(row[0], row[1])
+            iid = self.tree.insert('', 'end', values=list(row) + self.metadata_values(key), tags=tags)
+            self.result_keys.setdefault(key, []).append(iid)
+        PROFILER.record('treeview', 'load_columnar', start, rows=len(rows))
+        self.results_label.config(text=f"Results: {len(rows)} records" + (f" ({in_library} in library)" if in_library else ""))
+
+    def toggle_columnar(self):
+        if not self.columnar_var.get():
+            self.columnar = None
+            return
+        self.results_label.config(text="Loading in-memory snapshot...")
+        threading.Thread(target=self._build_columnar, daemon=True).start()
+
+    def _build_columnar(self):
+        try:
+            snapshot = ColumnarArchive.load(list(self.archives))
+        except sqlite3.Error as e:
+            message = str(e)  # `e` is unbound once the except block ends, before the callback runs
+            self.root.after(0, lambda: (self.columnar_var.set(False), messagebox.showerror("Database Error", message)))
+            return
+
+        def install():
+            if self.columnar_var.get():
+                self.columnar = snapshot
+                self.search()
+        self.root.after(0, install)
+
     def search(self):
+        if self.columnar is not None:
+            fields = {f.lower(): f for f in ColumnarArchive.FIELDS}
+            values = {name: var.get().strip() for name, var in self.search_vars.items()}
+            equals = {fields[n]: v for n, v in values.items() if v and n in ['dj', 'club', 'town', 'country', 'source']}
+            contains = {fields[n]: v for n, v in values.items() if v and n not in ['dj', 'club', 'town', 'country', 'source']}
+            self.load_columnar(equals, contains)
+            return
+
         conditions = []
         params = []
 
         for field_name, var_name in self.search_vars.items():
             value = var_name.get().strip()
-            if value:
+            if value and field_name != 'source':  # Source picks which archives are queried, not a column
                 if field_name in ['dj', 'club', 'town', 'country']:
                     conditions.append(f"{field_name.title()} = ?")
                     params.append(value)
@@ -753,19 +1942,21 @@ DATA COMPLETENESS:
 
         select_cols = "Artist, Title, Label, DJ, Club, Venue, Town, Country, Date"
         base_query = f"SELECT {select_cols} FROM Playlists"
+        source = self.search_vars['source'].get() or None
         if conditions:
             query = base_query + " WHERE " + " AND ".join(conditions) + " ORDER BY Date DESC"
+            self.load_data(query, params, source=source)
         else:
             query = base_query + " ORDER BY Date DESC LIMIT 500"
-
-        self.load_data(query, params)
+            self.load_data(query, params, 500, source)
 
     def clear_search(self):
         for var in self.search_vars.values():
             var.set('')
         for combo in self.dropdowns.values():
             combo.set('')
-        self.load_data()
+        if self.columnar is not None: self.search()
+        else: self.load_data()
 
     def sort_column(self, col):
         data = [(self.tree.set(item, col), item) for item in self.tree.get_children('')]
@@ -811,15 +2002,18 @@ DATA COMPLETENESS:
         if file_path:
             with open(file_path, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow(['Artist', 'Title', 'Label', 'DJ', 'Club', 'Venue', 'Town', 'Country', 'Date'])
-                for item in items: writer.writerow(self.tree.item(item, 'values'))
+                header = ['Artist', 'Title', 'Label', 'DJ', 'Club', 'Venue', 'Town', 'Country', 'Date'] + (['Source'] if len(self.archives) > 1 else [])
+                writer.writerow(header)
+                for item in items: writer.writerow(self.tree.item(item, 'values')[:len(header)])
 
     def create_playlist(self):
         name = simpledialog.askstring("New Playlist", "Enter playlist name:")
         if name:
             try:
-                self.cursor_playlists.execute("INSERT INTO user_playlists (name) VALUES (?)", (name,))
-                self.conn_playlists.commit(); self.load_playlists()
+                with self.conn_playlists:
+                    p_id = self.conn_playlists.execute("INSERT INTO user_playlists (name) VALUES (?)", (name,)).lastrowid
+                    self.log_new_playlist(p_id)
+                self.load_playlists()
             except sqlite3.IntegrityError: messagebox.showerror("Error", "Playlist name already exists!")
 
     def rename_playlist(self):
@@ -828,25 +2022,36 @@ DATA COMPLETENESS:
         item_id = selection[0]; current_name = self.playlist_tree.item(item_id, 'text')
         new_name = simpledialog.askstring("Rename", "New name:", initialvalue=current_name)
         if new_name and new_name != current_name:
-            p_id = self.playlist_tree.item(item_id, 'tags')[0]
-            self.cursor_playlists.execute("UPDATE user_playlists SET name = ? WHERE id = ?", (new_name, p_id))
-            self.conn_playlists.commit(); self.load_playlists()
+            p_id = int(self.playlist_tree.item(item_id, 'tags')[0])
+            try:
+                with self.conn_playlists:
+                    self.begin_playlist_edit(p_id)
+                    self.conn_playlists.execute("UPDATE user_playlists SET name = ? WHERE id = ?", (new_name, p_id))
+                    self.log_playlist_op(p_id, 'rename', {'old': current_name, 'new': new_name})
+            except sqlite3.IntegrityError: messagebox.showerror("Error", "Playlist name already exists!"); return
+            self.load_playlists()
 
     def delete_playlist(self):
         selection = self.playlist_tree.selection()
         if not selection: return
         item_id = selection[0]; name = self.playlist_tree.item(item_id, 'text')
         if messagebox.askyesno("Confirm", f"Delete '{name}'?"):
-            p_id = self.playlist_tree.item(item_id, 'tags')[0]
-            self.cursor_playlists.execute("DELETE FROM user_playlists WHERE id = ?", (p_id,))
-            self.conn_playlists.commit(); self.load_playlists()
+            p_id = int(self.playlist_tree.item(item_id, 'tags')[0])
+            with self.conn_playlists:
+                self.begin_playlist_edit(p_id)
+                self.conn_playlists.execute("DELETE FROM playlist_items WHERE playlist_id = ?", (p_id,))
+                self.conn_playlists.execute("DELETE FROM user_playlists WHERE id = ?", (p_id,))
+                self.log_playlist_op(p_id, 'delete', {'name': name})
+            self.load_playlists()
             self.playlist_contents_tree.delete(*self.playlist_contents_tree.get_children())
 
     def load_playlists(self):
         for item in self.playlist_tree.get_children(): self.playlist_tree.delete(item)
         self.cursor_playlists.execute("SELECT up.id, up.name, up.created_date, COUNT(pi.id) FROM user_playlists up LEFT JOIN playlist_items pi ON up.id = pi.playlist_id GROUP BY up.id ORDER BY up.created_date DESC")
-        for p_id, name, created, count in self.cursor_playlists.fetchall():
+        rows = self.cursor_playlists.fetchall(); start = time.perf_counter()
+        for p_id, name, created, count in rows:
             self.playlist_tree.insert('', 'end', text=name, values=(count, created.split()[0]), tags=(p_id,))
+        PROFILER.record('treeview', 'load_playlists', start, rows=len(rows))
 
     def on_playlist_select(self, event):
         selection = self.playlist_tree.selection()
@@ -856,8 +2061,10 @@ DATA COMPLETENESS:
 
     def load_playlist_contents(self, playlist_id):
         for item in self.playlist_contents_tree.get_children(): self.playlist_contents_tree.delete(item)
-        self.cursor_playlists.execute("SELECT artist, title, label, dj, club, town, country, date FROM playlist_items WHERE playlist_id = ? ORDER BY position", (playlist_id,))
-        for row in self.cursor_playlists.fetchall(): self.playlist_contents_tree.insert('', 'end', values=row)
+        self.cursor_playlists.execute("SELECT artist, title, label, dj, club, town, country, date FROM playlist_items WHERE playlist_id = ? ORDER BY position, id", (playlist_id,))
+        rows = self.cursor_playlists.fetchall(); start = time.perf_counter()
+        for row in rows: self.playlist_contents_tree.insert('', 'end', values=row, tags=self.library_tags(row[0], row[1]))
+        PROFILER.record('treeview', 'load_playlist_contents', start, rows=len(rows))
 
     def add_to_playlist(self):
         selection = self.tree.selection()
@@ -871,45 +2078,887 @@ DATA COMPLETENESS:
         selected_id = next((pid for pid, pname in playlists if pname.lower() == result.lower()), None)
         if selected_id:
             vals = self.tree.item(selection[0], 'values')
-            self.cursor_playlists.execute("INSERT INTO playlist_items (playlist_id, artist, title, label, dj, club, town, country, date, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM playlist_items WHERE playlist_id = ?))", (selected_id, vals[0], vals[1], vals[2], vals[3], vals[4], vals[6], vals[7], vals[8], selected_id))
-            self.conn_playlists.commit(); self.load_playlists()
+            item = [vals[0], vals[1], vals[2], vals[3], vals[4], vals[6], vals[7], vals[8]]
+            with self.conn_playlists:
+                self.begin_playlist_edit(selected_id)
+                pos = self.conn_playlists.execute("SELECT COUNT(*) FROM playlist_items WHERE playlist_id = ?", (selected_id,)).fetchone()[0]
+                self.conn_playlists.execute("INSERT INTO playlist_items (playlist_id, artist, title, label, dj, club, town, country, date, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM playlist_items WHERE playlist_id = ?))", (selected_id, *item, selected_id))
+                self.log_playlist_op(selected_id, 'insert', {'pos': pos, 'item': item})
+            self.load_playlists()
 
     def remove_from_playlist(self):
         selection = self.playlist_contents_tree.selection()
         if not selection or not self.playlist_tree.selection(): return
-        p_id = self.playlist_tree.item(self.playlist_tree.selection()[0], 'tags')[0]
-        vals = self.playlist_contents_tree.item(selection[0], 'values')
-        self.cursor_playlists.execute("DELETE FROM playlist_items WHERE playlist_id = ? AND artist = ? AND title = ? LIMIT 1", (p_id, vals[0], vals[1]))
-        self.conn_playlists.commit(); self.load_playlist_contents(p_id); self.load_playlists()
+        p_id = int(self.playlist_tree.item(self.playlist_tree.selection()[0], 'tags')[0])
+        idx = self.playlist_contents_tree.get_children().index(selection[0])
+        with self.conn_playlists:
+            self.begin_playlist_edit(p_id)
+            rows = self.conn_playlists.execute("SELECT id, artist, title, label, dj, club, town, country, date FROM playlist_items WHERE playlist_id = ? ORDER BY position, id", (p_id,)).fetchall()
+            self.conn_playlists.execute("DELETE FROM playlist_items WHERE id = ?", (rows[idx][0],))
+            self.log_playlist_op(p_id, 'remove', {'pos': idx, 'item': list(rows[idx][1:])})
+        self.load_playlist_contents(p_id); self.load_playlists()
 
     def move_track(self, direction):
         selection = self.playlist_contents_tree.selection()
         if not selection or not self.playlist_tree.selection(): return
-        p_id = self.playlist_tree.item(self.playlist_tree.selection()[0], 'tags')[0]
+        p_id = int(self.playlist_tree.item(self.playlist_tree.selection()[0], 'tags')[0])
         item_iid = selection[0]; all_iids = self.playlist_contents_tree.get_children()
         idx = all_iids.index(item_iid); new_idx = idx + direction
         if 0 <= new_idx < len(all_iids):
-            vals = self.playlist_contents_tree.item(item_iid, 'values')
-            self.cursor_playlists.execute("SELECT id, position FROM playlist_items WHERE playlist_id = ? AND artist = ? AND title = ?", (p_id, vals[0], vals[1]))
-            tid, pos = self.cursor_playlists.fetchone()
-            target_vals = self.playlist_contents_tree.item(all_iids[new_idx], 'values')
-            self.cursor_playlists.execute("SELECT id, position FROM playlist_items WHERE playlist_id = ? AND artist = ? AND title = ?", (p_id, target_vals[0], target_vals[1]))
-            oid, opos = self.cursor_playlists.fetchone()
-            self.cursor_playlists.execute("UPDATE playlist_items SET position = ? WHERE id = ?", (opos, tid))
-            self.cursor_playlists.execute("UPDATE playlist_items SET position = ? WHERE id = ?", (pos, oid))
-            self.conn_playlists.commit(); self.load_playlist_contents(p_id)
+            with self.conn_playlists:
+                self.begin_playlist_edit(p_id)
+                rows = self.conn_playlists.execute("SELECT id, position FROM playlist_items WHERE playlist_id = ? ORDER BY position, id", (p_id,)).fetchall()
+                (tid, pos), (oid, opos) = rows[idx], rows[new_idx]
+                if pos == opos: opos = pos + direction
+                self.conn_playlists.execute("UPDATE playlist_items SET position = ? WHERE id = ?", (opos, tid))
+                self.conn_playlists.execute("UPDATE playlist_items SET position = ? WHERE id = ?", (pos, oid))
+                self.log_playlist_op(p_id, 'move', {'from': idx, 'to': new_idx})
+            self.load_playlist_contents(p_id)
+
+    # --- Methods for Playlist History ---
+    def playlist_head(self, p_id):
+        """(latest version, the version it was made on top of) for a playlist, or (0, None) before its first logged edit."""
+        row = self.conn_playlists.execute("SELECT version, base FROM playlist_ops WHERE playlist_id = ? ORDER BY version DESC LIMIT 1", (p_id,)).fetchone()
+        return row if row else (0, None)
+
+    def read_playlist_state(self, p_id):
+        """The playlist as currently stored in user_playlists/playlist_items."""
+        row = self.conn_playlists.execute("SELECT name, created_date FROM user_playlists WHERE id = ?", (p_id,)).fetchone()
+        if row is None: return empty_playlist_state()
+        items = self.conn_playlists.execute("SELECT artist, title, label, dj, club, town, country, date FROM playlist_items WHERE playlist_id = ? ORDER BY position, id", (p_id,)).fetchall()
+        return {'name': row[0], 'created': row[1], 'items': [list(item) for item in items], 'deleted': False}
+
+    def write_playlist_state(self, p_id, state):
+        """Replace a playlist's stored rows with `state`. Call inside a transaction."""
+        self.conn_playlists.execute("DELETE FROM playlist_items WHERE playlist_id = ?", (p_id,))
+        if state['deleted']:
+            self.conn_playlists.execute("DELETE FROM user_playlists WHERE id = ?", (p_id,))
+            return
+        self.conn_playlists.execute("""INSERT INTO user_playlists (id, name, created_date) VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                                       ON CONFLICT(id) DO UPDATE SET name = excluded.name""", (p_id, state['name'], state['created']))
+        self.conn_playlists.executemany(
+            "INSERT INTO playlist_items (playlist_id, artist, title, label, dj, club, town, country, date, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(p_id, *item, pos) for pos, item in enumerate(state['items'], start=1)])
+
+    def begin_playlist_edit(self, p_id):
+        """Checkpoint a playlist that predates version history so its first logged edit can be undone."""
+        if self.playlist_head(p_id)[0] == 0:
+            self.conn_playlists.execute("INSERT OR IGNORE INTO playlist_checkpoints (playlist_id, version, state) VALUES (?, 0, ?)",
+                                        (p_id, json.dumps(self.read_playlist_state(p_id))))
+
+    def log_new_playlist(self, p_id, items=()):
+        """Log a playlist just created (and optionally filled) in the current transaction."""
+        name, created = self.conn_playlists.execute("SELECT name, created_date FROM user_playlists WHERE id = ?", (p_id,)).fetchone()
+        self.log_playlist_op(p_id, 'create', {'name': name, 'created': created})
+        if items: self.log_playlist_op(p_id, 'insert_many', {'pos': 0, 'items': [list(item) for item in items]})
+
+    def log_playlist_op(self, p_id, op, data):
+        """Append one edit to the playlist's history. Call inside the transaction that made the edit.
+
+        Only the delta is stored. A full checkpoint is added once the edits since the last one
+        outnumber the playlist's tracks (and at least PLAYLIST_CHECKPOINT_MIN_OPS), so rebuilding any
+        version replays a bounded number of ops while checkpoints cost at most one track per edit.
+        """
+        head, _ = self.playlist_head(p_id)
+        version = head + 1
+        if op == 'restore':
+            # The restored state inherits the lineage of the version it copies, so a further undo keeps going back
+            row = self.conn_playlists.execute("SELECT base FROM playlist_ops WHERE playlist_id = ? AND version = ?", (p_id, data['to'])).fetchone()
+            base = row[0] if row else None
+        else:
+            base = head
+            self.playlist_redo.pop(p_id, None)
+        self.conn_playlists.execute("INSERT INTO playlist_ops (playlist_id, version, base, op, data) VALUES (?, ?, ?, ?, ?)",
+                                    (p_id, version, base, op, json.dumps(data)))
+        last = self.conn_playlists.execute("SELECT COALESCE(MAX(version), 0) FROM playlist_checkpoints WHERE playlist_id = ?", (p_id,)).fetchone()[0]
+        if version - last < PLAYLIST_CHECKPOINT_MIN_OPS: return version
+        count = self.conn_playlists.execute("SELECT COUNT(*) FROM playlist_items WHERE playlist_id = ?", (p_id,)).fetchone()[0]
+        if version - last < count: return version
+        self.conn_playlists.execute("INSERT OR REPLACE INTO playlist_checkpoints (playlist_id, version, state) VALUES (?, ?, ?)",
+                                    (p_id, version, json.dumps(self.read_playlist_state(p_id))))
+        return version
+
+    def playlist_state_at(self, p_id, version):
+        """Rebuild a playlist as of `version` from the nearest checkpoint plus the ops after it (None if compacted away)."""
+        row = self.conn_playlists.execute("SELECT version, state FROM playlist_checkpoints WHERE playlist_id = ? AND version <= ? ORDER BY version DESC LIMIT 1",
+                                          (p_id, version)).fetchone()
+        if row:
+            start, state = row[0], json.loads(row[1])
+        else:
+            # Playlists created with history on start from nothing; anything else was compacted
+            first = self.conn_playlists.execute("SELECT MIN(version) FROM playlist_ops WHERE playlist_id = ?", (p_id,)).fetchone()[0]
+            if first != 1: return None
+            start, state = 0, empty_playlist_state()
+        ops = self.conn_playlists.execute("SELECT op, data FROM playlist_ops WHERE playlist_id = ? AND version > ? AND version <= ? ORDER BY version",
+                                          (p_id, start, version)).fetchall()
+        for op, data in ops: apply_playlist_op(state, op, json.loads(data))
+        return state
+
+    def restore_playlist_version(self, p_id, version):
+        """Make `version` the current state of a playlist by logging a 'restore' op. False if that version is gone.
+
+        The op stores the diff from the current state, so undoing one edit logs about as much as the edit did.
+        """
+        state = self.playlist_state_at(p_id, version)
+        if state is None: return False
+        ops = diff_playlist_states(self.read_playlist_state(p_id), state)
+        with self.conn_playlists:
+            self.write_playlist_state(p_id, state)
+            self.log_playlist_op(p_id, 'restore', {'to': version, 'ops': ops})
+        return True
+
+    def history_target(self):
+        """The selected playlist, or the most recently edited one (which may have just been deleted)."""
+        selection = self.playlist_tree.selection()
+        if selection: return int(self.playlist_tree.item(selection[0], 'tags')[0])
+        row = self.conn_playlists.execute("SELECT playlist_id FROM playlist_ops ORDER BY seq DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def show_playlist(self, p_id):
+        """Reload the playlist list and select `p_id`, or clear the contents pane if it no longer exists."""
+        self.load_playlists()
+        for iid in self.playlist_tree.get_children():
+            if int(self.playlist_tree.item(iid, 'tags')[0]) == p_id:
+                self.playlist_tree.selection_set(iid); self.playlist_tree.see(iid)
+                self.on_playlist_select(None)
+                return
+        self.playlist_contents_tree.delete(*self.playlist_contents_tree.get_children())
+        self.playlist_label.config(text="Select a playlist")
+
+    def undo_playlist(self):
+        p_id = self.history_target()
+        if p_id is None: return
+        head, base = self.playlist_head(p_id)
+        try:
+            restored = head > 0 and base is not None and self.restore_playlist_version(p_id, base)
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Undo", "Another playlist now uses this playlist's earlier name."); return
+        if not restored:
+            messagebox.showinfo("Undo", "Nothing to undo."); return
+        self.playlist_redo.setdefault(p_id, []).append(head)
+        self.show_playlist(p_id)
+
+    def redo_playlist(self):
+        p_id = self.history_target()
+        if p_id is None: return
+        stack = self.playlist_redo.get(p_id)
+        if not stack:
+            messagebox.showinfo("Redo", "Nothing to redo."); return
+        version = stack.pop()
+        try:
+            restored = self.restore_playlist_version(p_id, version)
+        except sqlite3.IntegrityError:
+            stack.append(version)
+            messagebox.showerror("Redo", "Another playlist now uses that name."); return
+        if not restored:
+            messagebox.showinfo("Redo", "That version is no longer in the history."); return
+        self.show_playlist(p_id)
+
+    def compact_playlist_history(self, keep=PLAYLIST_HISTORY_KEEP):
+        """Drop ops and checkpoints from before the newest checkpoint that still leaves `keep` versions per playlist.
+
+        Returns the number of rows removed. Versions older than that checkpoint can no longer be restored.
+        """
+        removed = 0
+        with self.conn_playlists:
+            heads = self.conn_playlists.execute("SELECT playlist_id, MAX(version) FROM playlist_ops GROUP BY playlist_id").fetchall()
+            for p_id, head in heads:
+                horizon = self.conn_playlists.execute("SELECT MAX(version) FROM playlist_checkpoints WHERE playlist_id = ? AND version <= ?",
+                                                      (p_id, head - keep)).fetchone()[0]
+                if not horizon: continue
+                removed += self.conn_playlists.execute("DELETE FROM playlist_ops WHERE playlist_id = ? AND version <= ?", (p_id, horizon)).rowcount
+                removed += self.conn_playlists.execute("DELETE FROM playlist_checkpoints WHERE playlist_id = ? AND version < ?", (p_id, horizon)).rowcount
+        return removed
+
+    def show_history_window(self):
+        p_id = self.history_target()
+        if p_id is None:
+            messagebox.showinfo("Playlist History", "No playlist history yet."); return
+        state = self.read_playlist_state(p_id)
+        if state['deleted']: state = self.playlist_state_at(p_id, self.playlist_head(p_id)[0] - 1) or state
+
+        window = tk.Toplevel(self.root)
+        window.title(f"History: {state['name'] or 'deleted playlist'}")
+        window.geometry("560x400")
+        frame = ttk.Frame(window, padding="10")
+        frame.pack(fill='both', expand=True)
+
+        tree = ttk.Treeview(frame, columns=('Version', 'Change', 'When'), show='headings', selectmode='browse')
+        for col, width in (('Version', 60), ('Change', 320), ('When', 140)):
+            tree.heading(col, text=col); tree.column(col, width=width)
+        scroll = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            rows = self.conn_playlists.execute("SELECT version, op, data, created_date FROM playlist_ops WHERE playlist_id = ? ORDER BY version DESC", (p_id,)).fetchall()
+            for version, op, data, created in rows:
+                tree.insert('', 'end', iid=str(version), values=(version, describe_playlist_op(op, json.loads(data)), created))
+
+        def on_restore():
+            selection = tree.selection()
+            if not selection: return
+            try:
+                restored = self.restore_playlist_version(p_id, int(selection[0]))
+            except sqlite3.IntegrityError:
+                messagebox.showerror("Playlist History", "Another playlist now uses that name.", parent=window); return
+            if not restored:
+                messagebox.showinfo("Playlist History", "That version is no longer in the history.", parent=window); return
+            refresh(); self.show_playlist(p_id)
+
+        def on_compact():
+            removed = self.compact_playlist_history()
+            refresh()
+            messagebox.showinfo("Playlist History", f"Removed {removed:,} old history rows.", parent=window)
+
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill='x', side='bottom', pady=(10,0))
+        ttk.Button(btn_frame, text="Restore Version", command=on_restore).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Compact History", command=on_compact).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Close", command=window.destroy).pack(side='right')
+        tree.pack(side='left', fill='both', expand=True)
+        scroll.pack(side='right', fill='y')
+        refresh()
 
     def export_playlist(self):
         selection = self.playlist_tree.selection()
         if not selection: return
         p_id = self.playlist_tree.item(selection[0], 'tags')[0]; name = self.playlist_tree.item(selection[0], 'text')
-        path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile=f"{name}.csv")
-        if path:
+        path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile=f"{name}.csv", filetypes=[("CSV files", "*.csv"), ("M3U playlists", "*.m3u")])
+        if path and path.lower().endswith(('.m3u', '.m3u8')):
+            self.cursor_playlists.execute("SELECT artist, title FROM playlist_items WHERE playlist_id = ? ORDER BY position", (p_id,))
+            rows = self.cursor_playlists.fetchall()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("#EXTM3U\n")
+                for artist, title in rows:
+                    local_file = self.library_file(artist, title)
+                    if local_file: f.write(f"#EXTINF:-1,{artist} - {title}\n{local_file}\n")
+                    else: f.write(f"# Not in library: {artist} - {title}\n")
+        elif path:
             with open(path, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f); writer.writerow(['Artist', 'Title', 'Label', 'DJ', 'Club', 'Town', 'Country', 'Date'])
                 self.cursor_playlists.execute("SELECT artist, title, label, dj, club, town, country, date FROM playlist_items WHERE playlist_id = ? ORDER BY position", (p_id,))
                 for row in self.cursor_playlists.fetchall(): writer.writerow(row)
 
+    # --- Methods for Federated Archives ---
+    def open_archives(self):
+        """Mount the master plus any extra archives from archive_sources, each with its own reader connection."""
+        for conn in self.archive_readers.values(): conn.close()
+        if self.archive_pool: self.archive_pool.shutdown(wait=False)
+        self.archive_readers, self.archive_pool = {}, None
+
+        self.archives = [(os.path.splitext(os.path.basename(MASTER_DB_FILE))[0], MASTER_DB_FILE)]
+        try:
+            self.cursor_playlists.execute("SELECT name, path FROM archive_sources ORDER BY name")
+            extra = self.cursor_playlists.fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading archive sources: {e}")
+            extra = []
+        for name, path in extra:
+            if not os.path.exists(path):
+                print(f"Note: archive '{name}' not found at {path}; skipping.")
+                continue
+            problem = archive_problem(path)
+            if problem:
+                print(f"Note: archive '{name}' at {path} can't be searched ({problem}); skipping.")
+                continue
+            self.archives.append((name, path))
+
+        if len(self.archives) > 1:
+            try:
+                self.archive_readers = {path: open_archive_reader(path) for _, path in self.archives}
+            except sqlite3.Error as e:
+                print(f"Error opening archives: {e}")
+                self.archives = self.archives[:1]
+                return
+            self.archive_pool = ThreadPoolExecutor(max_workers=len(self.archives))
+
+    def on_each_archive(self, func, archives=None):
+        """Run func(name, reader connection) for every mounted archive (or just `archives`) in parallel; results in archive order."""
+        return list(self.archive_pool.map(lambda archive: func(archive[0], self.archive_readers[archive[1]]), archives or self.archives))
+
+    def query_archives(self, query, params, limit=None, source=None):
+        """Run a SELECT ordered by Date DESC on every archive (or only those named `source`) and k-way merge the results, tagging rows with their source."""
+        archives = [archive for archive in self.archives if source in (None, archive[0])]
+        if not archives: return []
+        if len(self.archives) == 1:
+            self.cursor_master.execute(query, params)
+            name = self.archives[0][0]
+            return [row + (name,) for row in self.cursor_master.fetchall()]
+
+        results = self.on_each_archive(lambda name, conn: [row + (name,) for row in conn.execute(query, params).fetchall()], archives)
+        merged = heapq.merge(*results, key=date_sort_key, reverse=True)
+        return list(islice(merged, limit)) if limit else list(merged)
+
+    def update_source_column(self):
+        columns = self.tree['columns']
+        self.tree['displaycolumns'] = columns if len(self.archives) > 1 else [c for c in columns if c != 'Source']
+        if self.search_vars['source'].get() not in [name for name, _ in self.archives]:
+            self.search_vars['source'].set('')
+        for widget in self.source_controls:
+            if len(self.archives) > 1: widget.grid()
+            else: widget.grid_remove()
+
+    def show_archives_window(self):
+        window = tk.Toplevel(self.root)
+        window.title("Archives")
+        window.geometry("550x300")
+        window.transient(self.root)
+
+        frame = ttk.Frame(window, padding="10")
+        frame.pack(fill='both', expand=True)
+        ttk.Label(frame, text=f"Searched together with {MASTER_DB_FILE}:").pack(anchor='w')
+
+        archive_list = tk.Listbox(frame, height=8)
+        archive_list.pack(fill='both', expand=True, pady=5)
+
+        def reload_archives():
+            archive_list.delete(0, tk.END)
+            self.cursor_playlists.execute("SELECT name, path FROM archive_sources ORDER BY name")
+            for name, path in self.cursor_playlists.fetchall(): archive_list.insert(tk.END, f"{name}  ({path})")
+
+        def add_archive():
+            path = filedialog.askopenfilename(parent=window, title="Add Archive", filetypes=[("SQLite databases", "*.db *.sqlite"), ("All files", "*.*")])
+            if not path: return
+            problem = archive_problem(path)
+            if problem:
+                messagebox.showerror("Error", f"{os.path.basename(path)} can't be searched as an archive: {problem}.", parent=window)
+                return
+            name = simpledialog.askstring("Archive Name", "Name shown in the Source column:", parent=window,
+                                          initialvalue=os.path.splitext(os.path.basename(path))[0])
+            if not name: return
+            try:
+                self.cursor_playlists.execute("INSERT INTO archive_sources (path, name) VALUES (?, ?)", (path, name))
+                self.conn_playlists.commit()
+            except sqlite3.IntegrityError:
+                messagebox.showerror("Error", "That archive is already mounted!", parent=window)
+                return
+            reload_archives(); self.remount_archives()
+
+        def remove_archive():
+            selection = archive_list.curselection()
+            if not selection: return
+            self.cursor_playlists.execute("SELECT path FROM archive_sources ORDER BY name")
+            path = self.cursor_playlists.fetchall()[selection[0]][0]
+            self.cursor_playlists.execute("DELETE FROM archive_sources WHERE path = ?", (path,))
+            self.conn_playlists.commit()
+            reload_archives(); self.remount_archives()
+
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill='x', pady=(5,0))
+        ttk.Button(btn_frame, text="Add Archive", command=add_archive).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Remove", command=remove_archive).pack(side='left')
+        reload_archives()
+
+    def remount_archives(self):
+        self.open_archives()
+        self.load_aggregates()
+        self.populate_dropdowns()
+        self.render_stats()
+        self.update_source_column()
+        self.first_page = None
+        if self.columnar is not None:
+            self.columnar = None
+            threading.Thread(target=self._build_columnar, daemon=True).start()
+        self.search()
+        if self.first_page is None: self.load_first_page()
+        self.save_startup_snapshot()
+
+    # --- Methods for Local Music Library ---
+    def load_library_index(self):
+        try:
+            self.cursor_playlists.execute("SELECT match_key, path FROM library_files")
+            self.library_index = dict(self.cursor_playlists.fetchall())
+        except sqlite3.Error as e:
+            print(f"Error loading music library index: {e}")
+
+    def library_file(self, artist, title):
+        """Local file for a track, if the music library has one that still exists."""
+        path = self.library_index.get(normalize_track(artist, title))
+        return path if path and os.path.exists(path) else None
+
+    def library_tags(self, artist, title):
+        if self.library_index and normalize_track(artist, title) in self.library_index:
+            return ('in_library',)
+        return ()
+
+    # --- Methods for Release Metadata ---
+    def load_metadata_cache(self):
+        try:
+            self.cursor_playlists.execute("SELECT match_key, label, catno, year, artwork, fetched_at FROM metadata_cache WHERE provider = ?", (METADATA_PROVIDER,))
+            self.metadata_cache = {key: tuple(rest) for key, *rest in self.cursor_playlists.fetchall()}
+        except sqlite3.Error as e:
+            print(f"Error loading release metadata cache: {e}")
+
+    def metadata_values(self, key):
+        """Release Label, Cat No and Year cells for a track, from the cache only."""
+        entry = self.metadata_cache.get(key)
+        return [entry[0] or '', entry[1] or '', entry[2] or ''] if entry else ['', '', '']
+
+    def lookup_metadata(self):
+        """Fetch release info for the selected results (or all shown results) that aren't cached or have expired."""
+        iids = self.tree.selection() or self.tree.get_children()
+        expiry = time.time() - METADATA_CACHE_TTL_DAYS * 86400
+        tracks = {}
+        for iid in iids:
+            artist, title = self.tree.item(iid, 'values')[:2]
+            key = normalize_track(artist, title)
+            entry = self.metadata_cache.get(key)
+            if artist and title and key not in tracks and (entry is None or entry[4] < expiry):
+                tracks[key] = (artist, title)
+        if not tracks:
+            messagebox.showinfo("Release Info", "Release info for these tracks is already cached.")
+            return
+
+        if self.metadata_fetcher is None:
+            try:
+                self.metadata_fetcher = MetadataFetcher(METADATA_PROVIDERS[METADATA_PROVIDER]())
+            except ValueError as e:
+                messagebox.showerror("Release Info", str(e))
+                return
+
+        keys = list(tracks)
+        futures = self.metadata_fetcher.submit(tracks.values())
+        batch = {'pending': len(futures), 'total': len(futures), 'rows': [], 'errors': []}
+        self.results_label.config(text=f"Looking up release info for {len(futures)} tracks...")
+        for key, future in zip(keys, futures):
+            future.add_done_callback(lambda f, key=key: self.root.after(0, self._store_metadata, key, f, batch))
+
+    def _store_metadata(self, key, future, batch):
+        """Runs on the UI thread as each lookup finishes; answers are cached in batches and shown straight away."""
+        if future.cancelled(): return
+        batch['pending'] -= 1
+        if future.exception() is not None:
+            batch['errors'].append(future.exception())
+        else:
+            meta = future.result() or {}
+            entry = (meta.get('label'), meta.get('catno'), None if meta.get('year') is None else str(meta['year']), meta.get('artwork'), time.time())
+            self.metadata_cache[key] = entry
+            batch['rows'].append((key, self.metadata_fetcher.provider.name) + entry)
+            for iid in self.result_keys.get(key, ()):
+                if self.tree.exists(iid):
+                    for col, value in zip(('Release Label', 'Cat No', 'Year'), self.metadata_values(key)): self.tree.set(iid, col, value)
+
+        done = batch['total'] - batch['pending']
+        if batch['rows'] and (len(batch['rows']) >= METADATA_FLUSH_EVERY or not batch['pending']):
+            try:
+                with self.conn_playlists:
+                    self.conn_playlists.executemany("INSERT OR REPLACE INTO metadata_cache (match_key, provider, label, catno, year, artwork, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)", batch['rows'])
+            except sqlite3.Error as e:
+                print(f"Error saving release metadata: {e}")
+            batch['rows'] = []
+        if batch['pending']:
+            self.results_label.config(text=f"Looking up release info: {done} of {batch['total']}...")
+            return
+        self.results_label.config(text=f"Release info looked up for {done - len(batch['errors'])} of {batch['total']} tracks")
+        if batch['errors']:
+            messagebox.showwarning("Release Info", f"{len(batch['errors'])} lookups failed and will be retried next time.\n\n{batch['errors'][0]}")
+
+    def open_artwork(self):
+        artist, title = self.get_selected_track()
+        if not artist or not title: return
+        entry = self.metadata_cache.get(normalize_track(artist, title))
+        if entry and entry[3]: webbrowser.open(entry[3])
+        else: messagebox.showinfo("Release Info", "No artwork cached for this track yet. Use Look Up Release Info first.")
+
+    def show_library_window(self):
+        window = tk.Toplevel(self.root)
+        window.title("Music Library")
+        window.geometry("500x350")
+        window.transient(self.root)
+
+        frame = ttk.Frame(window, padding="10")
+        frame.pack(fill='both', expand=True)
+        ttk.Label(frame, text="Folders scanned for local audio files:").pack(anchor='w')
+
+        folder_list = tk.Listbox(frame, height=10)
+        folder_list.pack(fill='both', expand=True, pady=5)
+        status_label = ttk.Label(frame, text=f"{len(self.library_index):,} tracks indexed")
+        status_label.pack(anchor='w')
+
+        def reload_folders():
+            folder_list.delete(0, tk.END)
+            self.cursor_playlists.execute("SELECT path FROM library_folders ORDER BY path")
+            for (path,) in self.cursor_playlists.fetchall(): folder_list.insert(tk.END, path)
+
+        def add_folder():
+            path = filedialog.askdirectory(parent=window, title="Add Music Folder")
+            if path:
+                self.cursor_playlists.execute("INSERT OR IGNORE INTO library_folders (path) VALUES (?)", (path,))
+                self.conn_playlists.commit(); reload_folders()
+
+        def remove_folder():
+            selection = folder_list.curselection()
+            if selection:
+                self.cursor_playlists.execute("DELETE FROM library_folders WHERE path = ?", (folder_list.get(selection[0]),))
+                self.conn_playlists.commit(); reload_folders()
+
+        def rescan():
+            folders = list(folder_list.get(0, tk.END))
+            status_label.config(text="Scanning...")
+
+            def done(result):
+                self.load_library_index()
+                if status_label.winfo_exists():
+                    status_label.config(text=result)
+                self.search()
+            threading.Thread(target=lambda: self.root.after(0, done, self.scan_library(folders)), daemon=True).start()
+
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill='x', pady=(5,0))
+        ttk.Button(btn_frame, text="Add Folder", command=add_folder).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Remove", command=remove_folder).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Rescan", command=rescan).pack(side='left')
+        reload_folders()
+
+    def scan_library(self, folders):
+        """Index audio files under `folders`; only new or changed files (by size and mtime) have their tags read.
+
+        Runs off the UI thread with its own connection; returns a status message.
+        """
+        def walk(folder):
+            found = {}
+            for dirpath, _, filenames in os.walk(folder):
+                for filename in filenames:
+                    if filename.lower().endswith(LIBRARY_EXTENSIONS):
+                        path = os.path.join(dirpath, filename)
+                        try:
+                            st = os.stat(path)
+                        except OSError:
+                            continue
+                        found[path] = (st.st_size, st.st_mtime_ns)
+            return found
+
+        conn = sqlite3.connect(USER_PLAYLIST_DB_FILE, factory=ProfiledConnection)
+        try:
+            known = {path: (size, mtime) for path, size, mtime in conn.execute("SELECT path, size, mtime_ns FROM library_files")}
+            seen = {}
+            with ThreadPoolExecutor(max_workers=max(1, len(folders))) as walkers:
+                for found in walkers.map(walk, folders):
+                    seen.update(found)
+
+            changed = [path for path, stat in seen.items() if known.get(path) != stat]
+            if len(changed) >= LIBRARY_POOL_MIN_FILES:
+                with ProcessPoolExecutor() as readers:
+                    tags = list(readers.map(read_audio_tags, changed, chunksize=64))
+            else:
+                tags = [read_audio_tags(path) for path in changed]
+
+            removed = [(path,) for path in known if path not in seen]
+            with conn:
+                conn.executemany("DELETE FROM library_files WHERE path = ?", removed)
+                conn.executemany("INSERT OR REPLACE INTO library_files (path, size, mtime_ns, artist, title, match_key) VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(path, *seen[path], artist, title, normalize_track(artist, title)) for path, (artist, title) in zip(changed, tags)])
+            return f"{len(seen):,} files indexed ({len(changed):,} new or changed, {len(removed):,} removed)"
+        except (sqlite3.Error, OSError) as e:
+            return f"Scan failed: {e}"
+        finally:
+            conn.close()
+
+    # --- Methods for Playlist Import ---
+    def import_playlist(self):
+        path = filedialog.askopenfilename(filetypes=[("Playlists", "*.csv *.m3u *.m3u8"), ("CSV files", "*.csv"), ("M3U playlists", "*.m3u *.m3u8")])
+        if not path: return
+        name = simpledialog.askstring("Import Playlist", "Playlist name:", initialvalue=os.path.splitext(os.path.basename(path))[0])
+        if not name: return
+        try:
+            tracks = read_playlist_file(path)
+            matched, unmatched = self.import_tracks(name, tracks)
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            messagebox.showerror("Import Error", f"Could not read {path}: {e}")
+            return
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Error", "Playlist name already exists!")
+            return
+        except sqlite3.Error as e:
+            messagebox.showerror("Database Error", str(e))
+            return
+        self.load_playlists()
+        report = f"Imported {matched} of {len(tracks)} tracks into '{name}'."
+        if unmatched:
+            shown = [f"Line {n}: {a} - {t}" for n, a, t in unmatched[:20]]
+            if len(unmatched) > 20: shown.append(f"... and {len(unmatched) - 20} more")
+            report += "\n\nNot found in the archive:\n" + "\n".join(shown)
+        messagebox.showinfo("Import Playlist", report)
+
+    def import_tracks(self, name, tracks):
+        """Match (artist, title) pairs to archive tracks with one join and store them as a new playlist.
+
+        Returns (matched count, [(line number, artist, title)] for unmatched lines).
+        """
+        self.ensure_track_keys()
+        # Commit the scratch-table writes so no transaction is left open on the master connection
+        with self.conn_master:
+            self.cursor_master.execute("CREATE TEMP TABLE IF NOT EXISTS import_lines (line_no INTEGER PRIMARY KEY, match_key TEXT)")
+            self.cursor_master.execute("DELETE FROM import_lines")
+            self.cursor_master.executemany("INSERT INTO import_lines (line_no, match_key) VALUES (?, ?)",
+                                           [(n, normalize_track(a, t)) for n, (a, t) in enumerate(tracks, start=1)])
+            self.cursor_master.execute("""SELECT l.line_no, k.artist, k.title, k.label, k.dj, k.club, k.town, k.country, k.date
+                                          FROM import_lines l JOIN track_keys k ON k.match_key = l.match_key
+                                          ORDER BY l.line_no""")
+            matched = self.cursor_master.fetchall()
+            self.cursor_master.execute("DELETE FROM import_lines")
+
+        found = {row[0] for row in matched}
+        unmatched = [(n, a, t) for n, (a, t) in enumerate(tracks, start=1) if n not in found]
+        with self.conn_playlists:
+            p_id = self.conn_playlists.execute("INSERT INTO user_playlists (name) VALUES (?)", (name,)).lastrowid
+            self.conn_playlists.executemany(
+                "INSERT INTO playlist_items (playlist_id, artist, title, label, dj, club, town, country, date, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(p_id,) + tuple(row[1:]) + (pos,) for pos, row in enumerate(matched, start=1)])
+            self.log_new_playlist(p_id, [row[1:] for row in matched])
+        return len(matched), unmatched
+
+    def ensure_track_keys(self):
+        """Make sure temp.track_keys exists: one row per normalised artist|title with its most-played spelling and latest play.
+
+        Normally prefetch_track_keys() has built it already; this only scans here if an import beats it.
+        """
+        if not self.has_track_keys():
+            self.install_track_keys(track_key_rows(self.conn_master))
+
+    def has_track_keys(self):
+        self.cursor_master.execute("SELECT 1 FROM temp.sqlite_master WHERE name = 'track_keys'")
+        return self.cursor_master.fetchone() is not None
+
+    def install_track_keys(self, rows):
+        if self.has_track_keys(): return
+        with self.conn_master:
+            self.cursor_master.execute("""CREATE TEMP TABLE track_keys (match_key TEXT PRIMARY KEY, artist TEXT, title TEXT, label TEXT,
+                                          dj TEXT, club TEXT, town TEXT, country TEXT, date TEXT)""")
+            self.cursor_master.executemany("INSERT OR IGNORE INTO track_keys VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def prefetch_track_keys(self):
+        """Scan for temp.track_keys on a worker thread after (re)connecting to the master, so imports don't wait on it.
+
+        Temp tables belong to the connection, so the rows are only installed if the master hasn't been reconnected meanwhile.
+        """
+        conn = self.conn_master
+
+        def work():
+            try:
+                reader = open_archive_reader(MASTER_DB_FILE)
+                try:
+                    rows = track_key_rows(reader)
+                finally:
+                    reader.close()
+            except sqlite3.Error as e:
+                print(f"Note: could not prepare playlist import matching: {e}")
+                return
+            self.root.after(0, install, rows)
+
+        def install(rows):
+            if self.conn_master is conn:
+                self.install_track_keys(rows)
+
+        threading.Thread(target=work, daemon=True).start()
+
+    # --- Methods for Playlist Generator ---
+    def show_generate_dialog(self):
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Generate Playlist")
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        frame = ttk.Frame(dialog, padding="10")
+        frame.pack(fill='both', expand=True)
+
+        gen_vars = {
+            'name': tk.StringVar(),
+            'length': tk.StringVar(value='50'),
+            'dj': tk.StringVar(),
+            'era': tk.StringVar(),
+            'country': tk.StringVar(),
+            'label': tk.StringVar(),
+        }
+        fields = [('Playlist Name', 'name'), ('Tracks', 'length'), ('DJ', 'dj'),
+                  ('Era (e.g. 1972-1976)', 'era'), ('Country', 'country'), ('Label', 'label')]
+        for row, (text, var_name) in enumerate(fields):
+            ttk.Label(frame, text=text + ":").grid(row=row, column=0, sticky=tk.W, pady=2)
+            if var_name in ('dj', 'country'):
+                combo = ttk.Combobox(frame, textvariable=gen_vars[var_name], width=28, state="readonly")
+                combo['values'] = self.dropdowns[var_name]['values']
+                combo.grid(row=row, column=1, sticky=(tk.W, tk.E), pady=2, padx=(5,0))
+            else:
+                ttk.Entry(frame, textvariable=gen_vars[var_name], width=30).grid(row=row, column=1, sticky=(tk.W, tk.E), pady=2, padx=(5,0))
+
+        use_seeds = tk.BooleanVar(value=bool(self.tree.selection()))
+        ttk.Checkbutton(frame, text="Seed with selected search results", variable=use_seeds).grid(row=len(fields), column=0, columnspan=2, sticky=tk.W, pady=(5,0))
+
+        def on_generate():
+            name = gen_vars['name'].get().strip()
+            if not name:
+                messagebox.showwarning("Generate Playlist", "Please enter a playlist name.", parent=dialog)
+                return
+            try:
+                length = int(gen_vars['length'].get())
+                if length <= 0: raise ValueError
+            except ValueError:
+                messagebox.showwarning("Generate Playlist", "Tracks must be a positive number.", parent=dialog)
+                return
+            try:
+                filters = {key: gen_vars[key].get().strip() for key in ('dj', 'era', 'country', 'label')}
+                seeds = []
+                if use_seeds.get():
+                    seeds = [tuple(self.tree.item(iid, 'values')[:2]) for iid in self.tree.selection()]
+                count = self.generate_playlist(name, length, filters, seeds)
+            except ValueError as e:
+                messagebox.showwarning("Generate Playlist", str(e), parent=dialog)
+                return
+            except sqlite3.IntegrityError:
+                messagebox.showerror("Error", "Playlist name already exists!", parent=dialog)
+                return
+            except sqlite3.Error as e:
+                messagebox.showerror("Database Error", str(e), parent=dialog)
+                return
+            dialog.destroy()
+            self.load_playlists()
+            messagebox.showinfo("Generate Playlist", f"Created '{name}' with {count} tracks.")
+
+        btn_frame = ttk.Frame(frame)
+        btn_frame.grid(row=len(fields) + 1, column=0, columnspan=2, pady=(10,0))
+        ttk.Button(btn_frame, text="Generate", command=on_generate).pack(side='left', padx=(0,5))
+        ttk.Button(btn_frame, text="Cancel", command=dialog.destroy).pack(side='left')
+
+    def generate_playlist(self, name, length, filters, seeds=()):
+        """Build a playlist from filters/seed tracks and write it to user_playlists in one transaction."""
+        conditions = []
+        params = []
+        if filters.get('dj'):
+            conditions.append("DJ = ?"); params.append(filters['dj'])
+        if filters.get('country'):
+            conditions.append("Country = ?"); params.append(filters['country'])
+        if filters.get('label'):
+            conditions.append("Label LIKE ?"); params.append(f"%{filters['label']}%")
+        if filters.get('era'):
+            parts = [p.strip() for p in filters['era'].split('-')]
+            if not all(p.isdigit() and len(p) == 4 for p in parts) or len(parts) > 2:
+                raise ValueError("Era must be a year or a range like 1972-1976.")
+            start, end = parts[0], parts[-1]
+            conditions.append("(SUBSTR(Date, -4) BETWEEN ? AND ? OR SUBSTR(Date, 1, 4) BETWEEN ? AND ?)")
+            params.extend([start, end, start, end])
+        if seeds and not conditions:
+            # No filters: draw candidates from the sets (DJ + Date) the seeds were played in
+            seed_match = " OR ".join(["(Artist = ? AND Title = ?)"] * len(seeds))
+            conditions.append(f"(DJ, Date) IN (SELECT DJ, Date FROM Playlists WHERE {seed_match})")
+            for artist, title in seeds: params.extend([artist, title])
+        if not conditions:
+            raise ValueError("Choose at least one filter or seed track.")
+
+        # The bare rowid next to MAX(Date) is the most recent play of each track. The (DJ, Date) sets each
+        # track was played in come from the same scan, so co-play is counted among matching plays. Every
+        # column here is in playlists_generator_idx; the rest of each row is fetched for the pool only
+        columns = f"""Artist, Title, rowid, MAX(Date), COUNT(*) AS plays,
+                      GROUP_CONCAT(CASE WHEN DJ != '' THEN DJ || char(31) || Date END, char(30))"""
+        query = f"""SELECT {columns}
+                    FROM Playlists
+                    WHERE Artist IS NOT NULL AND Artist != '' AND Title IS NOT NULL AND Title != ''
+                    AND {' AND '.join(conditions)}
+                    GROUP BY Artist, Title ORDER BY plays DESC, Artist, Title LIMIT {GENERATOR_POOL_SIZE}"""
+        self.cursor_master.execute(query, params)
+        pool = self.cursor_master.fetchall()
+        if not pool:
+            raise ValueError("No tracks match those filters.")
+
+        # Seeds outside the most-played candidates are still used, so add them to the pool
+        in_pool = {(row[0], row[1]) for row in pool}
+        for artist, title in dict.fromkeys(seeds):
+            if (artist, title) not in in_pool:
+                self.cursor_master.execute(f"SELECT {columns} FROM Playlists WHERE Artist = ? AND Title = ? GROUP BY Artist, Title", (artist, title))
+                pool.extend(self.cursor_master.fetchall())
+
+        details = {}
+        row_ids = [row[2] for row in pool]
+        for start in range(0, len(row_ids), 500):
+            chunk = row_ids[start:start + 500]
+            self.cursor_master.execute(f"SELECT rowid, Label, DJ, Club, Town, Country FROM Playlists WHERE rowid IN ({', '.join('?' * len(chunk))})", chunk)
+            details.update((row[0], row[1:]) for row in self.cursor_master.fetchall())
+        pool = [(artist, title) + details[row_id] + tuple(rest) for artist, title, row_id, *rest in pool]
+
+        seed_keys = set(seeds)
+        seed_idx = [i for i, row in enumerate(pool) if (row[0], row[1]) in seed_keys]
+        order = self._sequence_tracks(pool, length, seed_idx)
+
+        with self.conn_playlists:
+            cur = self.conn_playlists.execute("INSERT INTO user_playlists (name) VALUES (?)", (name,))
+            p_id = cur.lastrowid
+            self.conn_playlists.executemany(
+                "INSERT INTO playlist_items (playlist_id, artist, title, label, dj, club, town, country, date, position) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(p_id,) + tuple(pool[i][:8]) + (pos,) for pos, i in enumerate(order, start=1)])
+            self.log_new_playlist(p_id, [pool[i][:8] for i in order])
+        return len(order)
+
+    def _sequence_tracks(self, pool, length, seed_idx=()):
+        """Greedy ordering by co-play strength, then 2-opt passes to improve neighbouring transitions.
+
+        Pool rows end with plays and the track's (DJ, Date) sets as a GROUP_CONCAT string. Co-play
+        counts are only worked out for tracks that get placed, so the cost doesn't grow with the archive.
+        """
+        popularity = [0.1 * math.log1p(row[8]) for row in pool]
+        artist_of = [row[0].lower() for row in pool]
+        label_of = [(row[2] or '').lower() for row in pool]
+        sets_of = [set(row[9].split('\x1e')) if row[9] else set() for row in pool]
+        members = defaultdict(list)  # "DJ\x1fDate" -> candidates played in that set
+        for idx, sets in enumerate(sets_of):
+            for s in sets: members[s].append(idx)
+        links = {}
+
+        def links_of(a):
+            """{other track: number of sets shared with track a}."""
+            if a not in links:
+                links[a] = Counter(chain.from_iterable(members[s] for s in sets_of[a]))
+            return links[a]
+
+        def link(a, b):
+            return links_of(a).get(b, 0)
+
+        def label_ok(seq, pos, idx):
+            label = label_of[idx]
+            if not label: return True
+            lo, hi = max(0, pos - GENERATOR_LABEL_GAP + 1), min(len(seq), pos + GENERATOR_LABEL_GAP)
+            return all(label_of[seq[k]] != label for k in range(lo, hi) if k != pos)
+
+        order = []
+        used_artists = set()
+        for idx in seed_idx:
+            if artist_of[idx] not in used_artists and len(order) < length:
+                order.append(idx); used_artists.add(artist_of[idx])
+        if not order:
+            order.append(0); used_artists.add(artist_of[0])
+
+        while len(order) < length:
+            last_links = links_of(order[-1])
+            recent_labels = {label_of[k] for k in order[-(GENERATOR_LABEL_GAP - 1):]} if GENERATOR_LABEL_GAP > 1 else set()
+            best, best_score, fallback = None, None, None
+            for idx in range(len(pool)):
+                if artist_of[idx] in used_artists: continue
+                score = last_links.get(idx, 0) + popularity[idx]
+                if label_of[idx] and label_of[idx] in recent_labels:
+                    if fallback is None: fallback = idx
+                    continue
+                if best_score is None or score > best_score:
+                    best, best_score = idx, score
+            if best is None: best = fallback
+            if best is None: break
+            order.append(best); used_artists.add(artist_of[best])
+
+        # 2-opt: reversing order[i:j+1] only changes the two boundary transitions
+        n = len(order)
+        for _ in range(3):
+            improved = False
+            for i in range(1, n - 1):
+                for j in range(i + 1, n):
+                    before = link(order[i-1], order[i]) + (link(order[j], order[j+1]) if j + 1 < n else 0)
+                    after = link(order[i-1], order[j]) + (link(order[i], order[j+1]) if j + 1 < n else 0)
+                    if after > before + 1e-9:
+                        candidate = order[:i] + order[i:j+1][::-1] + order[j+1:]
+                        window = range(max(0, i - GENERATOR_LABEL_GAP), min(n, j + GENERATOR_LABEL_GAP))
+                        if all(label_ok(candidate, k, candidate[k]) for k in window):
+                            order = candidate; improved = True
+            if not improved: break
+        return order
+
     def show_playlist_context_menu(self, event):
         item = self.playlist_contents_tree.identify_row(event.y)
         if item: self.playlist_contents_tree.selection_set(item); self.playlist_context_menu.post(event.x_root, event.y_root)
@@ -933,6 +2982,7 @@ DATA COMPLETENESS:
             webbrowser.open(urls[service])
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Library scans use a process pool, also inside the PyInstaller build
     root = tk.Tk(); root.withdraw()
     splash = tk.Toplevel(root); splash.overrideredirect(True)
     try:
@@ -943,6 +2993,12 @@ if __name__ == "__main__":
         splash.geometry("300x100"); tk.Label(splash, text="Loading Application...", font=("Helvetica", 16)).pack(pady=30)
     splash.update(); app = MinimalPlaylistApp(root); splash.destroy(); root.deiconify()
     def on_closing():
+        if app.download_pipeline: app.download_pipeline.shutdown()
+        if app.metadata_fetcher: app.metadata_fetcher.shutdown()
+        for conn in app.archive_readers.values(): conn.close()
+        if app.conn_playlists:
+            try: app.compact_playlist_history()
+            except sqlite3.Error: pass
         if app.conn_master: app.conn_master.close()
         if app.conn_playlists: app.conn_playlists.close()
         root.destroy()